@@ -0,0 +1,46 @@
+import base64
+import json
+import math
+
+from fastapi import HTTPException
+
+ORDERS = ("risk_asc", "risk_desc")
+# Filters a cursor carries, with the types each may hold
+FILTER_TYPES = {"state": (str, type(None)), "min_risk": (int, float), "is_anomaly": (bool, type(None))}
+
+
+def encode_cursor(version, order, filters, last_key):
+    """Opaque cursor: data version, sort order, filters and the last (risk_score, region_id) seen."""
+    payload = {"v": list(version), "o": order, "f": filters, "k": list(last_key)}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor; raises a 400 for anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        version = tuple(payload["v"])
+        order = payload["o"]
+        filters = dict(payload["f"])
+        last_risk, region_id = payload["k"]
+        if order not in ORDERS:
+            raise ValueError(order)
+        _check_filters(filters)
+        return version, order, filters, (float(last_risk), str(region_id))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def _check_filters(filters):
+    """Raises ValueError unless `filters` holds exactly FILTER_TYPES' keys with valid values."""
+    if set(filters) != set(FILTER_TYPES):
+        raise ValueError(sorted(filters))
+    for key, types in FILTER_TYPES.items():
+        value = filters[key]
+        # bool is an int subclass; a min_risk of true is forged, not a number
+        if not isinstance(value, types) or (key == "min_risk" and isinstance(value, bool)):
+            raise ValueError(key)
+    if not math.isfinite(filters["min_risk"]):
+        raise ValueError("min_risk")
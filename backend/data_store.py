@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from backend.region_index import RegionIndex
+from modules.chart_aggregates import build_chart_aggregates
+from modules.config import get_section
+from modules.rollup import build_rollup
+from modules.schema import ANOMALY_COLUMNS, PARTITION_ANOMALY_COLUMNS, map_columns, read_columns
+from modules.snapshots import live_dir
+from modules.storage import dataset_version
+from modules.summary import build_summary_artifact
+from modules.telemetry import record_bytes, record_cache, span
+
+
+class Snapshot:
+    """One immutable, fully-loaded version of the scored dataset and its indexes."""
+
+    def __init__(self, df, version, summary=None, charts=None, rollup=None, movers=None, mapped=False,
+                 source=None):
+        self.df = df
+        self.version = version  # storage.dataset_version() of the dataset it was read from
+        self.source = source  # output snapshot directory it was read from (None: fixed paths)
+        self.mapped = mapped  # df views the memory-mapped Arrow IPC copy rather than owning its data
+        self.regions = RegionIndex(df)
+        # Precomputed summary/top-K artifact; rebuilt here only if the pipeline's
+        # copy is missing or was written for a different version of the file.
+        record_cache("summary_artifact", hit=summary is not None)
+        if summary is None:
+            top_k = get_section("pipeline").get("top_k_anomalies", 100)
+            summary = build_summary_artifact(df, top_k=top_k, data_version=version)
+        self.summary = summary
+        # Same for the dashboard's chart aggregates (density grids, histograms, box stats)
+        record_cache("chart_artifact", hit=charts is not None)
+        if charts is None:
+            dashboard = get_section("dashboard")
+            charts = build_chart_aggregates(df, bins=dashboard.get("density_bins", 80),
+                                            max_points=dashboard.get("max_overlay_points", 2000),
+                                            data_version=version)
+        self.charts = charts
+        # And the state -> district -> sub_district rollup cube
+        record_cache("rollup_artifact", hit=rollup is not None)
+        if rollup is None:
+            rollup = build_rollup(df, data_version=version)
+        self.rollup = rollup
+        # Run-over-run movers need the previous run, so they come from the pipeline or not at all
+        record_cache("movers_artifact", hit=movers is not None)
+        self.movers = movers
+        self.loaded_at = time.time()
+
+
+class DatasetCache:
+    """Process-wide in-memory cache of a parquet dataset.
+
+    Readers get the current Snapshot without touching disk. When the dataset's
+    version changes (or `invalidate()` is called, e.g. after a pipeline run)
+    a background thread reloads it and swaps the new Snapshot in with a single
+    reference assignment, so a reader sees either the old frame or the new one,
+    never a half-loaded one. Only the very first load blocks.
+
+    The last `keep_versions` snapshots stay reachable through `get_version()`,
+    so a paginated walk pinned to one version keeps seeing that version.
+
+    With an `arrow_path` (the pipeline's Arrow IPC copy of the dataset) the
+    frame is memory-mapped from it instead of decoded from parquet, so every
+    worker process serving the same version shares one page-cache copy. The
+    parquet dataset stays the source of truth: the mapped file is only used
+    when it was published for the current parquet version.
+
+    With a `root`, the paths are file names inside the live output snapshot
+    under that directory (modules/snapshots.py). The pointer is resolved once
+    per load, so every file of a Snapshot comes from the same pipeline run.
+    """
+
+    def __init__(self, path, summary_path=None, charts_path=None, arrow_path=None, rollup_path=None,
+                 movers_path=None, keep_versions=2, root=None):
+        self.root = root
+        self.path = path
+        self.summary_path = summary_path
+        self.charts_path = charts_path
+        self.rollup_path = rollup_path
+        self.movers_path = movers_path
+        self.arrow_path = arrow_path
+        self._arrow_seen = None
+        self.keep_versions = max(int(keep_versions), 1)
+        self._snapshot = None
+        self._retained = OrderedDict()
+        self._retained_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._reloading = False
+
+    def _locate(self):
+        """(version, source directory) of what is live now; version is None if nothing is."""
+        source = live_dir(self.root) if self.root else None
+        try:
+            return dataset_version(self._at(source, self.path)), source
+        except FileNotFoundError:
+            return None, source
+
+    @staticmethod
+    def _at(source, path):
+        return os.path.join(source, path) if source and path else path
+
+    def _load_artifact(self, path, version):
+        """Reads a pipeline JSON artifact, or None if missing, unreadable or for another version."""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                artifact = json.load(f)
+        except Exception as e:
+            print(f"DatasetCache: Ignoring unreadable {path}: {e}")
+            return None
+        if tuple(artifact.get("data_version") or ()) != tuple(version):
+            return None
+        return artifact
+
+    def _arrow_file_version(self, source):
+        try:
+            return dataset_version(self._at(source, self.arrow_path)) if self.arrow_path else None
+        except FileNotFoundError:
+            return None
+
+    def _map(self, version, source):
+        """Maps the Arrow IPC copy if it mirrors `version`; None otherwise."""
+        self._arrow_seen = self._arrow_file_version(source)
+        if self._arrow_seen is None:
+            return None
+        arrow_path = self._at(source, self.arrow_path)
+        try:
+            df, arrow_version = map_columns(arrow_path, ANOMALY_COLUMNS + PARTITION_ANOMALY_COLUMNS)
+        except Exception as e:
+            print(f"DatasetCache: Ignoring unreadable {arrow_path}: {e}")
+            return None
+        return df if arrow_version == tuple(version) else None
+
+    def _load(self, version, source):
+        with span("dataset_load") as info:
+            df = self._map(version, source)
+            mapped = df is not None
+            if self.arrow_path:
+                record_cache("arrow_map", hit=mapped)
+            if not mapped:
+                path = self._at(source, self.path)
+                df = read_columns(path, ANOMALY_COLUMNS + PARTITION_ANOMALY_COLUMNS)
+                record_bytes("read", path, "dataset_load", columns=ANOMALY_COLUMNS + PARTITION_ANOMALY_COLUMNS)
+            info["rows"] = len(df)
+            return Snapshot(df, version,
+                            summary=self._load_artifact(self._at(source, self.summary_path), version),
+                            charts=self._load_artifact(self._at(source, self.charts_path), version),
+                            rollup=self._load_artifact(self._at(source, self.rollup_path), version),
+                            movers=self._load_artifact(self._at(source, self.movers_path), version),
+                            mapped=mapped, source=source)
+
+    def _publish(self, snapshot):
+        with self._retained_lock:
+            self._retained[snapshot.version] = snapshot
+            self._retained.move_to_end(snapshot.version)
+            while len(self._retained) > self.keep_versions:
+                self._retained.popitem(last=False)
+        self._snapshot = snapshot
+
+    def _reload(self, version, source):
+        try:
+            self._publish(self._load(version, source))
+        except Exception as e:
+            print(f"DatasetCache: Error reloading {self.path}: {e}")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _start_reload(self, version, source):
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(version, source), daemon=True).start()
+
+    def get(self):
+        """Returns the current Snapshot, or None if the file doesn't exist."""
+        snapshot = self._snapshot
+        version, source = self._locate()
+        if version is None:
+            return snapshot
+        record_cache("dataset", hit=snapshot is not None and version == snapshot.version)
+        if snapshot is None:
+            # Nothing to serve yet: load synchronously, once.
+            with self._lock:
+                if self._snapshot is None:
+                    try:
+                        self._publish(self._load(version, source))
+                    except Exception as e:
+                        print(f"DatasetCache: Error loading {self.path}: {e}")
+                return self._snapshot
+        if version != snapshot.version:
+            self._start_reload(version, source)
+        elif not snapshot.mapped and self.arrow_path and self._arrow_file_version(source) != self._arrow_seen:
+            # Without snapshots the Arrow copy lands just after the parquet dataset: switch to it then
+            self._start_reload(version, source)
+        return snapshot
+
+    def get_version(self, version):
+        """Returns the retained Snapshot for `version`, or None if it was evicted."""
+        self.get()
+        with self._retained_lock:
+            return self._retained.get(tuple(version))
+
+    def invalidate(self, wait=False):
+        """Forces a reload, e.g. after the pipeline has written a new file.
+
+        With `wait=True` the reload runs in the calling thread, so the next
+        `get()` is guaranteed to see the new data.
+        """
+        version, source = self._locate()
+        if version is None:
+            return
+        if wait:
+            self._publish(self._load(version, source))
+        else:
+            self._start_reload(version, source)
@@ -0,0 +1,110 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Rows converted per batch when streaming; bounds server memory for large exports.
+STREAM_BATCH_ROWS = 50_000
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+_ACCEPT_ALIASES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+
+
+def negotiate_format(fmt, accept):
+    """Picks the response format from an explicit `format=` or the Accept header."""
+    if fmt:
+        fmt = fmt.lower()
+        if fmt not in MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}. "
+                                f"Use one of {', '.join(MEDIA_TYPES)}.")
+        return fmt
+    for part in (accept or "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in _ACCEPT_ALIASES:
+            return _ACCEPT_ALIASES[media_type]
+    return "json"
+
+
+def project_columns(df, fields):
+    """Resolves a comma-separated `fields=` list against df's columns (None = all)."""
+    if not fields:
+        return list(df.columns)
+    columns = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [c for c in columns if c not in df.columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return columns
+
+
+class _ChunkSink:
+    """Write-only file object that buffers what pyarrow writes until drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._size = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _batches(df, positions, columns):
+    for start in range(0, len(positions), STREAM_BATCH_ROWS):
+        yield df.iloc[positions[start:start + STREAM_BATCH_ROWS]][columns]
+
+
+def _iter_ndjson(df, positions, columns):
+    for batch in _batches(df, positions, columns):
+        if not batch.empty:
+            yield batch.to_json(orient="records", lines=True, double_precision=15)
+
+
+def _iter_arrow(df, positions, columns, fmt):
+    sink = _ChunkSink()
+    schema = pa.Schema.from_pandas(df.iloc[:0][columns], preserve_index=False)
+    if fmt == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+    else:
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    for batch in _batches(df, positions, columns):
+        # Each batch becomes one IPC record batch / one parquet row group.
+        writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def streaming_response(df, positions, columns, fmt, headers=None):
+    """Streams df.iloc[positions][columns] as NDJSON, Arrow IPC stream or Parquet."""
+    if fmt == "ndjson":
+        body = _iter_ndjson(df, positions, columns)
+    else:
+        body = _iter_arrow(df, positions, columns, fmt)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,74 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueue:
+    """Single-flight background runner for pipeline jobs.
+
+    `submit()` returns at once. While a job is queued or running, further
+    submissions are deduplicated onto it instead of starting another run, so
+    repeated triggers cost nothing. Jobs run one at a time on a worker thread;
+    the last `keep` finished jobs stay queryable by id.
+    """
+
+    def __init__(self, run, keep=50):
+        self._run = run  # called with no arguments; its return value becomes the job's result
+        self.keep = keep
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock = threading.Lock()
+
+    def submit(self):
+        """Returns (job, created): the new job, or the one already queued/running."""
+        with self._lock:
+            if self._active is not None:
+                return dict(self._active), False
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": QUEUED,
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+            }
+            self._jobs[job["job_id"]] = job
+            self._active = job
+            self._evict()
+        threading.Thread(target=self._execute, args=(job,), daemon=True).start()
+        return dict(job), True
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in (SUCCEEDED, FAILED)]
+        for job_id in finished[:max(len(finished) - self.keep, 0)]:
+            del self._jobs[job_id]
+
+    def _execute(self, job):
+        with self._lock:
+            job["status"] = RUNNING
+            job["started_at"] = time.time()
+        try:
+            result, status, error = self._run(), SUCCEEDED, None
+        except Exception as e:
+            result, status, error = None, FAILED, str(e)
+        with self._lock:
+            job.update(status=status, result=result, error=error, finished_at=time.time())
+            self._active = None
+
+    def get(self, job_id):
+        """Snapshot of one job, or None if unknown (or evicted)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def list(self):
+        """All retained jobs, newest first."""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
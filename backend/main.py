@@ -1,10 +1,25 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Body, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 import pandas as pd
 import os
-import subprocess
-import asyncio
-from typing import List, Optional
+import time
+from datetime import date
+from typing import Dict, List, Optional
+
+from backend.cursors import ORDERS, decode_cursor, encode_cursor
+from backend.data_store import DatasetCache
+from backend.formats import negotiate_format, project_columns, streaming_response
+from backend.jobs import JobQueue
+from modules.anomaly_detector import AnomalyDetector
+from modules.history import HistoryStore
+from modules.model_store import ModelNotFoundError
+from modules.movers import DIRECTIONS, MOVER_METRICS
+from modules.rollup import LEVELS
+from modules.summary import records
+from modules.orchestrator import PipelineOrchestrator
+from modules.snapshots import OUTPUT_ROOT
+from modules.telemetry import REGISTRY, finish_span, rss_bytes, start_span
 
 app = FastAPI(title="Aadhaar A.I.R.R. API", version="0.1.0")
 
@@ -17,37 +32,178 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-DATA_PATH = "data/outputs/anomaly_data.parquet"
+# Files inside the live output snapshot under OUTPUT_ROOT (see modules/snapshots.py)
+DATA_PATH = "anomaly_data.parquet"
+SUMMARY_PATH = "summary.json"
+CHARTS_PATH = "charts.json"
+ROLLUP_PATH = "rollup.json"
+MOVERS_PATH = "movers.json"
+# Memory-mapped by every worker process: N workers share one copy of the data
+ARROW_PATH = "anomaly_data.arrow"
+
+# Shared by all requests in this process; reloads in the background when a new snapshot goes live.
+dataset = DatasetCache(DATA_PATH, summary_path=SUMMARY_PATH, charts_path=CHARTS_PATH, arrow_path=ARROW_PATH,
+                       rollup_path=ROLLUP_PATH, movers_path=MOVERS_PATH, root=OUTPUT_ROOT)
+# Per-run score history; keeps footers of the immutable history files in memory
+history = HistoryStore()
+# Scores ad-hoc regions against the persisted Isolation Forest (never retrains)
+scorer = AnomalyDetector(mode="score")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Per-endpoint latency histogram and request counter for /metrics, plus a
+    span per request so its RSS shows up under stage="api <endpoint>".
+
+    Latency is observed once the body has been fully sent, so streamed
+    exports are timed end to end rather than up to their first byte.
+    """
+    start = time.perf_counter()
+    request_span = start_span("api")
+
+    def observe(status):
+        route = request.scope.get("route")
+        labels = {"method": request.method, "endpoint": getattr(route, "path", "unmatched")}
+        REGISTRY.observe("airr_http_request_duration_seconds", time.perf_counter() - start,
+                         "HTTP request latency by endpoint", **labels)
+        REGISTRY.inc("airr_http_requests_total", 1, "HTTP requests by endpoint and status",
+                     status=status, **labels)
+        request_span["stage"] = f"api {labels['endpoint']}"
+        finish_span(request_span, "ok" if status < 500 else "error")
 
-def load_data():
-    if not os.path.exists(DATA_PATH):
-        return None
     try:
-        return pd.read_parquet(DATA_PATH)
-    except Exception as e:
-        print(f"Error loading data: {e}")
-        return None
+        response = await call_next(request)
+    except Exception:
+        observe(500)
+        raise
+
+    body = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            observe(response.status_code)
+
+    response.body_iterator = timed_body()
+    return response
 
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "service": "Aadhaar A.I.R.R. Backend"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Pipeline stage spans, I/O bytes, cache hits and HTTP latency in Prometheus text format."""
+    REGISTRY.set("airr_process_resident_memory_bytes", rss_bytes(), "Current RSS of the API process")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/api/summary")
-def get_summary():
-    df = load_data()
-    if df is None:
+def get_summary(state: Optional[str] = None):
+    snapshot = dataset.get()
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Data not available. Run pipeline first.")
     
-    summary = {
-        "total_regions": len(df),
-        "total_population_covered": int(df['population'].sum()),
-        "aadhaar_generated_total": int(df['aadhaar_generated'].sum()),
-        "avg_inclusion_score": float(df['inclusion_score'].mean()),
-        "avg_risk_score": float(df['risk_score'].mean()),
-        "total_anomalies": int(df['is_anomaly'].sum()),
-        "high_risk_regions": int(len(df[df['risk_score'] > 80]))
+    # Answered from the precomputed artifact: no full-table work per request
+    if state:
+        summary = snapshot.summary["by_state"].get(state)
+        if summary is None:
+            raise HTTPException(status_code=404, detail=f"Unknown state: {state}")
+        return summary
+    return snapshot.summary["global"]
+
+@app.get("/api/charts")
+def get_charts(state: Optional[str] = None):
+    """
+    Pre-aggregated chart data: density grids, histograms, box-plot stats and the
+    riskiest anomalies as an overlay. Size is fixed by the bin/overlay settings,
+    not by the number of regions.
+    """
+    snapshot = dataset.get()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Data not available. Run pipeline first.")
+
+    charts = snapshot.charts
+    if state:
+        scope = charts["by_state"].get(state)
+        if scope is None:
+            raise HTTPException(status_code=404, detail=f"Unknown state: {state}")
+    else:
+        scope = charts["global"]
+    return {"data_version": charts["data_version"], "state": state, **scope}
+
+@app.get("/api/rollup")
+def get_rollup(
+    level: Optional[str] = Query(None, description="state, district or sub_district; omit for the parent node only"),
+    parent: str = Query("", description="Key of the parent node: '' (all regions), 'State', 'State/District' "
+                                        "('/' in a name as '%2F', '%' as '%25')"),
+):
+    """
+    Precomputed rollup cube: population-weighted average scores, sums, anomaly
+    counts and score quantiles of `parent` and of its children at `level`.
+    Both are looked up in the artifact built at pipeline end, so the cost is
+    per node returned, not per region.
+    """
+    if level is not None and level not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {LEVELS}.")
+    snapshot = dataset.get()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Data not available. Run pipeline first.")
+
+    rollup = snapshot.rollup
+    node = rollup["nodes"].get(parent)
+    if node is None:
+        raise HTTPException(status_code=404, detail=f"Unknown rollup node: {parent}")
+    if level is not None:
+        depth = 0 if node["level"] is None else LEVELS.index(node["level"]) + 1
+        if LEVELS.index(level) != depth:
+            raise HTTPException(status_code=400, detail=f"Children of {parent or 'the root'} are at level "
+                                                        f"{LEVELS[depth] if depth < len(LEVELS) else 'none'}.")
+    return {
+        "data_version": rollup["data_version"],
+        "level": level,
+        "parent": node,
+        "nodes": [rollup["nodes"][key] for key in rollup["children"][level].get(parent, [])] if level else [],
+    }
+
+@app.get("/api/movers")
+def get_movers(
+    metric: str = "risk_score",
+    direction: str = "risers",
+    state: Optional[str] = None,
+    limit: int = Query(20, ge=1),
+):
+    """
+    Regions whose `metric` rose (or fell) most since the previous pipeline run.
+    The deltas and per-state top-K lists are computed when the run finishes;
+    `limit` beyond the pipeline's `top_k_movers` returns the full list.
+    """
+    if metric not in MOVER_METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {MOVER_METRICS}.")
+    if direction not in DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"direction must be one of {list(DIRECTIONS)}.")
+    snapshot = dataset.get()
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Data not available. Run pipeline first.")
+    movers = snapshot.movers
+    if movers is None:
+        raise HTTPException(status_code=404, detail="No run-over-run movers for this data. Run pipeline first.")
+
+    ranked = movers["metrics"][metric]
+    if state:
+        scope = ranked["by_state"].get(state)
+        if scope is None:
+            raise HTTPException(status_code=404, detail=f"Unknown state: {state}")
+    else:
+        scope = ranked["global"]
+    return {
+        "data_version": movers["data_version"],
+        "previous_run": movers["previous_run"],
+        "metric": metric,
+        "direction": direction,
+        "state": state,
+        "regions": scope[direction][:limit],
     }
-    return summary
 
 @app.get("/api/regions")
 def get_regions(
@@ -55,25 +211,35 @@ def get_regions(
     min_risk: float = 0.0, 
     is_anomaly: Optional[bool] = None,
     limit: int = 100,
-    offset: int = 0
+    offset: int = 0,
+    order: Optional[str] = Query(None, description="risk_asc or risk_desc: cursor pagination by (risk_score, region_id)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    format: Optional[str] = Query(None, description="json (default), ndjson, arrow or parquet"),
+    accept: Optional[str] = Header(None),
 ):
-    df = load_data()
-    if df is None:
+    fmt = negotiate_format(format, accept)
+    if cursor or order:
+        return _get_regions_keyset(state, min_risk, is_anomaly, limit, order, cursor, fields, fmt)
+    
+    snapshot = dataset.get()
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Data not available.")
+    columns = project_columns(snapshot.df, fields)
         
-    # Filtering
-    if state:
-        df = df[df['state'] == state]
+    # Filtering + pagination via the per-version secondary indexes
+    total_count, positions = snapshot.regions.query(
+        state=state, min_risk=min_risk, is_anomaly=is_anomaly, offset=offset, limit=limit
+    )
     
-    if min_risk > 0:
-        df = df[df['risk_score'] >= min_risk]
-        
-    if is_anomaly is not None:
-        df = df[df['is_anomaly'] == is_anomaly]
-        
-    # Pagination
-    total_count = len(df)
-    df_paginated = df.iloc[offset : offset + limit]
+    if fmt != "json":
+        # Streamed in batches; paging metadata travels in headers
+        # X-Data-Version lets clients fetching pages in parallel check they all came from one version
+        headers = {"X-Total-Count": str(total_count), "X-Limit": str(limit), "X-Offset": str(offset),
+                   "X-Data-Version": "-".join(map(str, snapshot.version))}
+        return streaming_response(snapshot.df, positions, columns, fmt, headers=headers)
+    
+    df_paginated = snapshot.df.iloc[positions][columns]
     
     return {
         "total": total_count,
@@ -82,49 +248,142 @@ def get_regions(
         "data": df_paginated.to_dict(orient="records")
     }
 
+def _get_regions_keyset(state, min_risk, is_anomaly, limit, order, cursor, fields, fmt):
+    """Keyset pagination: each page resumes after the last (risk_score, region_id) seen,
+    against the data version the walk started on."""
+    filters = {"state": state, "min_risk": min_risk, "is_anomaly": is_anomaly}
+    after = None
+    if cursor:
+        version, cursor_order, cursor_filters, after = decode_cursor(cursor)
+        # The cursor carries the walk's filters; explicit params may only repeat them
+        requested = {"state": state, "min_risk": min_risk or None, "is_anomaly": is_anomaly, "order": order}
+        carried = dict(cursor_filters, min_risk=cursor_filters["min_risk"] or None, order=cursor_order)
+        if any(v is not None and v != carried[k] for k, v in requested.items()):
+            raise HTTPException(status_code=400, detail="Query parameters don't match the cursor.")
+        filters, order = cursor_filters, cursor_order
+        snapshot = dataset.get_version(version)
+        if snapshot is None:
+            raise HTTPException(status_code=410, detail="Cursor expired: the data has changed. Restart from the first page.")
+    else:
+        if order not in ORDERS:
+            raise HTTPException(status_code=400, detail=f"order must be one of {', '.join(ORDERS)}")
+        snapshot = dataset.get()
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="Data not available.")
+    columns = project_columns(snapshot.df, fields)
+    
+    total_count, positions, last_key = snapshot.regions.keyset_query(
+        after=after, limit=limit, descending=(order == "risk_desc"), **filters
+    )
+    next_cursor = encode_cursor(snapshot.version, order, filters, last_key) if last_key else None
+    
+    if fmt != "json":
+        headers = {"X-Total-Count": str(total_count), "X-Limit": str(limit)}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return streaming_response(snapshot.df, positions, columns, fmt, headers=headers)
+    
+    return {
+        "total": total_count,
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "data": snapshot.df.iloc[positions][columns].to_dict(orient="records")
+    }
+
+@app.get("/api/regions/{region_id}/history")
+def get_region_history(
+    region_id: str,
+    start: Optional[date] = Query(None, description="First run date to include (YYYY-MM-DD)"),
+    end: Optional[date] = Query(None, description="Last run date to include (YYYY-MM-DD)"),
+):
+    """
+    Scores and anomaly flags of one region in every pipeline run between
+    `start` and `end`, oldest first. Only the run-date partitions in range and
+    the row groups that can hold the region are read.
+    """
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end.")
+    runs = history.region(region_id, start=start, end=end)
+    if runs.empty:
+        snapshot = dataset.get()
+        if snapshot is None or region_id not in snapshot.regions:
+            raise HTTPException(status_code=404, detail=f"Unknown region: {region_id}")
+    runs = runs.drop(columns="region_id")
+    runs["run_at"] = runs["run_at"].map(lambda t: t.isoformat())
+    runs["run_date"] = runs["run_date"].map(lambda d: d.isoformat())
+    return {
+        "region_id": region_id,
+        "start": start,
+        "end": end,
+        "runs": records(runs),
+    }
+
 @app.get("/api/anomalies/top")
-def get_top_anomalies(limit: int = 10):
-    df = load_data()
-    if df is None:
+def get_top_anomalies(limit: int = 10, state: Optional[str] = None):
+    snapshot = dataset.get()
+    if snapshot is None:
         raise HTTPException(status_code=404, detail="Data not available.")
     
-    # Sort by risk score descending
-    anomalies = df[df['is_anomaly'] == True].sort_values(by='risk_score', ascending=False).head(limit)
+    summary = snapshot.summary
+    if limit <= summary["top_k"]:
+        # Pre-ranked by risk score descending at pipeline end
+        if state:
+            return summary["top_anomalies_by_state"].get(state, [])[:limit]
+        return summary["top_anomalies"][:limit]
     
-    return anomalies.to_dict(orient="records")
+    # Deeper than the precomputed list: walk the risk-ordered index, no scan or sort
+    _, positions, _ = snapshot.regions.keyset_query(state=state, is_anomaly=True, limit=limit, descending=True)
+    return snapshot.df.iloc[positions].to_dict(orient="records")
 
-@app.post("/api/pipeline/run")
-async def run_pipeline():
+@app.post("/api/anomalies/score")
+def score_regions(regions: List[Dict[str, float]] = Body(..., min_length=1)):
     """
-    Triggers the data pipeline scripts asynchronously.
+    Scores one or more regions (feature name -> value) against the saved model.
+    Features a region leaves out are scored as 0.
     """
     try:
-        # We'll run them sequentially for simplicity in this prototype
-        commands = [
-            "python scripts/mock_data_gen.py", 
-            "python modules/data_pipeline.py", 
-            "python modules/scoring_engine.py", 
-            "python modules/anomaly_detector.py"
-        ]
-        
-        # Non-blocking run (fire and forget for this simple prototype, 
-        # or wait if we want to return success only after done. 
-        # Given the speed, we can wait.)
-        
-        for cmd in commands:
-            process = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            if process.returncode != 0:
-                raise Exception(f"Command {cmd} failed: {stderr.decode()}")
-                
-        return {"status": "success", "message": "Pipeline execution completed."}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        scores = scorer.score_regions(pd.DataFrame(regions))
+    except ModelNotFoundError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:  # unknown features, non-finite values
+        raise HTTPException(status_code=400, detail=f"Invalid regions: {e}")
+    return scores.to_dict(orient="records")
+
+def _run_pipeline_job():
+    """Regenerates the mock data, runs the full pipeline and publishes a new snapshot."""
+    result = PipelineOrchestrator().run(generate=True)
+    # Pipeline-completion signal: swap in the new snapshot before the job reports success.
+    dataset.invalidate(wait=True)
+    return {
+        "rows": result["rows"],
+        "snapshot": result["snapshot"],
+        "timings": result["timings"],
+        "total_seconds": result["total_seconds"],
+    }
+
+# One pipeline run at a time per process; triggers during a run join it
+jobs = JobQueue(_run_pipeline_job)
+
+@app.post("/api/pipeline/run", status_code=202)
+def run_pipeline(response: Response):
+    """
+    Queues a pipeline run and returns its job at once; poll /api/pipeline/jobs/{job_id}.
+    If a run is already queued or running, that job is returned instead.
+    """
+    job, created = jobs.submit()
+    response.headers["Location"] = f"/api/pipeline/jobs/{job['job_id']}"
+    return {**job, "deduplicated": not created}
+
+@app.get("/api/pipeline/jobs")
+def list_pipeline_jobs():
+    return jobs.list()
+
+@app.get("/api/pipeline/jobs/{job_id}")
+def get_pipeline_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+class PositionSet:
+    """Row positions matching one filter value, in row order and in risk order.
+
+    `rows` is ascending, so a page in the original row order is a plain slice.
+    `risk_sorted`/`risk_rows` are the same positions sorted by risk_score, so the
+    number of rows with risk_score >= x is one binary search.
+    """
+
+    __slots__ = ("rows", "risk_sorted", "risk_rows")
+
+    def __init__(self, rows, risk_rows, risk):
+        self.rows = rows
+        self.risk_rows = risk_rows
+        self.risk_sorted = risk[risk_rows]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def page(self, risk, min_risk, offset, limit):
+        """Returns (total matches, row positions of the requested page)."""
+        n = len(self.rows)
+        first = 0 if min_risk is None else int(np.searchsorted(self.risk_sorted, min_risk, side="left"))
+        matched = n - first
+        if first == 0:
+            return matched, self.rows[offset:offset + limit]
+        if offset >= matched or limit <= 0:
+            return matched, _EMPTY
+
+        needed = offset + limit
+        # Either walk `rows` in order until `needed` matches turn up (cheap when the
+        # risk filter is loose), or sort the matching tail of the risk order back
+        # into row order (cheap when it is tight). Pick whichever touches less.
+        expected_scan = needed * n / matched
+        if expected_scan >= matched:
+            return matched, np.sort(self.risk_rows[first:])[offset:needed]
+
+        found = []
+        n_found = 0
+        start = 0
+        step = max(1024, int(expected_scan))
+        while n_found < needed and start < n:
+            chunk = self.rows[start:start + step]
+            hits = chunk[risk[chunk] >= min_risk]
+            found.append(hits)
+            n_found += len(hits)
+            start += step
+            step *= 2
+        return matched, np.concatenate(found)[offset:needed]
+
+    def keyset_page(self, risk, region_codes, min_risk, after, limit, descending=False):
+        """Returns (total matches, row positions, has_more) for one keyset page.
+
+        Rows are ordered by (risk_score, region_id); `after` is the
+        (risk_score, region code threshold) of the last row already seen, or None
+        for the first page. Cost is O(log N + limit) however deep the page is.
+        """
+        n = len(self.rows)
+        lo = 0 if min_risk is None else int(np.searchsorted(self.risk_sorted, min_risk, side="left"))
+        matched = n - lo
+        start, end = lo, n
+        if after is not None:
+            last_risk, code = after
+            block_lo = int(np.searchsorted(self.risk_sorted, last_risk, side="left"))
+            block_hi = int(np.searchsorted(self.risk_sorted, last_risk, side="right"))
+            # Ties on risk_score are ordered by region code within the block.
+            block_codes = region_codes[self.risk_rows[block_lo:block_hi]]
+            split = block_lo + int(np.searchsorted(block_codes, code, side="left"))
+            if descending:
+                end = min(end, split)
+            else:
+                start = max(start, split)
+        if descending:
+            first = max(start, end - limit)
+            return matched, self.risk_rows[first:end][::-1], first > start
+        last = min(end, start + limit)
+        return matched, self.risk_rows[start:last], last < end
+
+
+class RegionIndex:
+    """Secondary indexes over one version of the scored dataset.
+
+    Built once per data version: state -> rows, is_anomaly -> rows, and the
+    (state, is_anomaly) intersections, each with a risk-sorted companion for
+    binary-search `min_risk` range queries. A filtered, paginated query costs
+    O(log N + page size) instead of a full boolean-mask scan.
+
+    The risk order is by (risk_score, region_id), which also makes it the key
+    for cursor (keyset) pagination.
+    """
+
+    def __init__(self, df):
+        self.risk = df['risk_score'].to_numpy(dtype=np.float64)
+        n = len(df)
+        pos_dtype = np.int32 if n < 2**31 else np.int64
+        row_order = np.arange(n, dtype=pos_dtype)
+        # region_id -> dense code in sorted order, for tie-breaking and cursor lookups
+        self.region_codes, self.region_ids = pd.factorize(df['region_id'], sort=True)
+        self.region_ids = np.asarray(self.region_ids, dtype=object)
+        # One global sort; every per-value risk order is a stable split of it.
+        risk_order = np.lexsort((self.region_codes, self.risk)).astype(pos_dtype)
+        self._all = PositionSet(row_order, risk_order, self.risk)
+
+        anomaly = df['is_anomaly'].to_numpy(dtype=bool)
+        codes, states = pd.factorize(df['state'], sort=False)
+        keys = {
+            "anomaly": (anomaly.astype(np.int64), [False, True]),
+            "state": (codes, list(states)),
+            "state_anomaly": (codes * 2 + anomaly, [(s, f) for s in states for f in (False, True)]),
+        }
+        sets = {}
+        for name, (key, values) in keys.items():
+            by_row = self._split(key, len(values), row_order)
+            by_risk = self._split(key, len(values), risk_order)
+            sets[name] = {v: PositionSet(r, rr, self.risk) for v, r, rr in zip(values, by_row, by_risk)}
+        self._by_anomaly = sets["anomaly"]
+        self._by_state = sets["state"]
+        self._by_state_anomaly = sets["state_anomaly"]
+
+    @staticmethod
+    def _split(key, n_values, order):
+        """Splits `order` into one array per key value, keeping the relative order."""
+        ordered = key[order]
+        if n_values < 2**15:
+            ordered = ordered.astype(np.int16)  # small ints get numpy's radix sort
+        grouped = order[np.argsort(ordered, kind="stable")]
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(key[key >= 0], minlength=n_values))))
+        # factorize() gives -1 to missing states; those sort first and are skipped.
+        skip = int((key < 0).sum())
+        return [grouped[skip + bounds[i]:skip + bounds[i + 1]] for i in range(n_values)]
+
+    def _position_set(self, state, is_anomaly):
+        if state and is_anomaly is not None:
+            return self._by_state_anomaly.get((state, bool(is_anomaly)))
+        if state:
+            return self._by_state.get(state)
+        if is_anomaly is not None:
+            return self._by_anomaly[bool(is_anomaly)]
+        return self._all
+
+    def __contains__(self, region_id):
+        i = int(np.searchsorted(self.region_ids, region_id))
+        return i < len(self.region_ids) and self.region_ids[i] == region_id
+
+    def query(self, state=None, min_risk=0.0, is_anomaly=None, offset=0, limit=100):
+        """Returns (total matches, row positions for rows[offset:offset + limit]).
+
+        Same semantics and row order as filtering the frame with boolean masks
+        (`min_risk` only applies when > 0).
+        """
+        offset = max(int(offset), 0)
+        limit = max(int(limit), 0)
+        positions = self._position_set(state, is_anomaly)
+        if positions is None:
+            return 0, _EMPTY
+        return positions.page(self.risk, min_risk if min_risk > 0 else None, offset, limit)
+
+    def keyset_query(self, state=None, min_risk=0.0, is_anomaly=None, after=None, limit=100,
+                     descending=False):
+        """Cursor pagination ordered by (risk_score, region_id).
+
+        `after` is the (risk_score, region_id) of the last row of the previous
+        page. Returns (total matches, row positions, key of the last row or None
+        when this is the final page).
+        """
+        limit = max(int(limit), 0)
+        positions = self._position_set(state, is_anomaly)
+        if positions is None:
+            return 0, _EMPTY, None
+        threshold = None
+        if after is not None:
+            last_risk, region_id = after
+            code = int(np.searchsorted(self.region_ids, region_id, side="left"))
+            found = code < len(self.region_ids) and self.region_ids[code] == region_id
+            # Ascending resumes at codes > region_id, descending at codes < region_id.
+            threshold = (float(last_risk), code + 1 if found and not descending else code)
+        total, rows, has_more = positions.keyset_page(
+            self.risk, self.region_codes, min_risk if min_risk > 0 else None, threshold, limit, descending
+        )
+        if not has_more or len(rows) == 0:
+            return total, rows, None
+        last = rows[-1]
+        return total, rows, (float(self.risk[last]), self.region_ids[self.region_codes[last]])
@@ -1,9 +1,19 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import json
 import os
 import sys
 
+# Make the project root importable when launched via `streamlit run dashboard/app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard.charts import box_figure, density_figure, histogram_figure, rollup_table, top_anomalies
+from modules.chart_aggregates import build_chart_aggregates
+from modules.config import get_section
+from modules.rollup import build_rollup, node_key
+from modules.schema import ANOMALY_COLUMNS, PARTITION_ANOMALY_COLUMNS, read_columns
+from modules.snapshots import live_dir
+from modules.storage import dataset_version, risk_filter
+
 # --- Configuration ---
 st.set_page_config(
     page_title="UIDAI A.I.R.R. Prototype (Demo)",
@@ -13,32 +23,30 @@ st.set_page_config(
 )
 
 # --- Data Loading Logic (Integrated from Backend) ---
-DATA_PATH = "data/outputs/anomaly_data.parquet"
+# Files inside the live output snapshot (see modules/snapshots.py)
+DATA_FILE = "anomaly_data.parquet"
+CHARTS_FILE = "charts.json"
+ROLLUP_FILE = "rollup.json"
+EXPLORER_ROWS = 10000  # Rows sent to the browser in the Data Explorer tab
 
 @st.cache_data(ttl=600)
-def load_data():
+def load_data(source, state=None):
     """
-    Loads data directly from parquet file, bypassing the backend API.
+    Loads data directly from the parquet dataset in the output snapshot
+    directory `source`, bypassing the backend API. Keyed on `source`, so a
+    newly published snapshot is picked up on the next rerun.
+    With a `state`, only that state's partition is read.
     Handles 'Cold Start' by generating mock data if missing.
     """
-    if not os.path.exists(DATA_PATH):
+    data_path = os.path.join(source, DATA_FILE)
+    if not os.path.exists(data_path):
         st.warning("Data not found. Generating mock data for the first time... (This may take a minute)")
         try:
-            # Attempt to run generation scripts
-            # Assuming we are at project root
-            import subprocess
-            
-            with st.spinner('Generating Mock Data...'):
-                subprocess.run([sys.executable, "scripts/mock_data_gen.py"], check=True)
+            # Run the whole pipeline in-process (assuming we are at project root)
+            from modules.orchestrator import PipelineOrchestrator
             
-            with st.spinner('Running Data Pipeline...'):
-                subprocess.run([sys.executable, "modules/data_pipeline.py"], check=True)
-                
-            with st.spinner('Scoring Regions...'):
-                subprocess.run([sys.executable, "modules/scoring_engine.py"], check=True)
-                
-            with st.spinner('Detecting Anomalies...'):
-                subprocess.run([sys.executable, "modules/anomaly_detector.py"], check=True)
+            with st.spinner('Generating data, scoring regions and detecting anomalies...'):
+                PipelineOrchestrator().run(generate=True)
                 
             st.success("Data Generation Complete!")
             st.rerun()
@@ -49,16 +57,56 @@ def load_data():
             return None
 
     try:
-        return pd.read_parquet(DATA_PATH)
+        return read_columns(data_path, ANOMALY_COLUMNS + PARTITION_ANOMALY_COLUMNS, filter=risk_filter(state=state))
     except Exception as e:
-        st.warning(f"Data seems corrupted. Auto-healing... ({e})")
-        # Self-healing: Delete corrupted file so it regenerates on next run
-        if os.path.exists(DATA_PATH):
-            os.remove(DATA_PATH)
+        # Published snapshots are never modified (API workers may be serving this one)
         st.cache_data.clear()
+        if live_dir() != source:
+            st.rerun()  # a newer snapshot went live while this one was read: use it
+        st.warning(f"Data seems corrupted. Publishing a fresh run... ({e})")
+        try:
+            from modules.orchestrator import PipelineOrchestrator
+
+            with st.spinner('Regenerating data, scoring regions and detecting anomalies...'):
+                PipelineOrchestrator().run(generate=True)
+        except Exception as e:
+            st.error(f"Failed to regenerate data: {e}")
+            return None
         st.rerun()
         return None
 
+@st.cache_data(ttl=600)
+def load_charts(source):
+    """
+    Loads the pipeline's pre-aggregated chart data (charts.json) from `source`.
+    Rebuilt from the dataset if missing or written for a different version of it.
+    """
+    version = dataset_version(os.path.join(source, DATA_FILE))
+    charts_path = os.path.join(source, CHARTS_FILE)
+    if os.path.exists(charts_path):
+        with open(charts_path, "r") as f:
+            charts = json.load(f)
+        if tuple(charts.get("data_version") or ()) == version:
+            return charts
+    dashboard = get_section("dashboard")
+    return build_chart_aggregates(load_data(source), bins=dashboard.get("density_bins", 80),
+                                  max_points=dashboard.get("max_overlay_points", 2000), data_version=version)
+
+@st.cache_data(ttl=600)
+def load_rollup(source):
+    """
+    Loads the pipeline's state -> district -> sub_district rollup cube
+    (rollup.json) from `source`; rebuilt like the chart data if stale.
+    """
+    version = dataset_version(os.path.join(source, DATA_FILE))
+    rollup_path = os.path.join(source, ROLLUP_FILE)
+    if os.path.exists(rollup_path):
+        with open(rollup_path, "r") as f:
+            rollup = json.load(f)
+        if tuple(rollup.get("data_version") or ()) == version:
+            return rollup
+    return build_rollup(load_data(source), data_version=version)
+
 def get_summary(df):
     if df is None: return None
     return {
@@ -79,8 +127,7 @@ state_filter = st.sidebar.selectbox("Filter by State", ["All", "Maharashtra", "U
 st.sidebar.divider()
 if st.sidebar.button("Regenerate Data (Reset)"):
     st.cache_data.clear()
-    # Optional: Delete file to force regeneration?
-    # os.remove(DATA_PATH)
+    # Published snapshots are never deleted from here; a new run replaces the live one
     st.rerun()
 
 st.sidebar.markdown("---")
@@ -89,7 +136,9 @@ st.sidebar.markdown("---")
 # --- Main Page ---
 st.title("Aadhaar Inclusion & Risk Radar")
 
-df = load_data()
+# Resolved once per rerun so every read below comes from the same pipeline run
+source = live_dir()
+df = load_data(source)
 
 if df is not None:
     summary = get_summary(df)
@@ -105,34 +154,36 @@ if df is not None:
     tab1, tab2, tab3, tab4 = st.tabs(["Overview", "Inclusion Radar", "Risk Radar", "Data Explorer"])
 
     # Filter Logic
+    charts = load_charts(source)
     if state_filter != "All":
-        filtered_df = df[df['state'] == state_filter]
+        filtered_df = load_data(source, state_filter)  # partition-pruned read
+        chart_data = charts["by_state"].get(state_filter)
     else:
         filtered_df = df
+        chart_data = charts["global"]
+
+    if chart_data is None:
+        st.info(f"No regions for {state_filter}.")
+        st.stop()
 
     with tab1:
         st.header("Executive Overview")
         col1, col2 = st.columns([2, 1])
         
         with col1:
-            fig = px.scatter(
-                filtered_df, 
-                x="inclusion_score", 
-                y="risk_score", 
-                size="population", 
-                color="is_anomaly",
-                hover_name="district",
+            fig = density_figure(
+                chart_data,
+                "inclusion_risk",
                 title="District Performance Matrix (Inclusion vs Risk)",
                 labels={"inclusion_score": "Inclusion Score (High Good)", "risk_score": "Risk Score (Low Good)"},
-                color_discrete_map={False: "#636EFA", True: "#EF553B"}
             )
             st.plotly_chart(fig, use_container_width=True)
             
         with col2:
             st.subheader("Top Anomalies")
-            anomalies = filtered_df[filtered_df['is_anomaly'] == True].sort_values(by="risk_score", ascending=False).head(10)
+            anomalies = pd.DataFrame(top_anomalies(chart_data, 10), columns=['district', 'risk_score', 'anomaly_reason'])
             st.dataframe(
-                anomalies[['district', 'risk_score', 'anomaly_reason']], 
+                anomalies, 
                 hide_index=True,
                 use_container_width=True
             )
@@ -141,37 +192,50 @@ if df is not None:
         st.header("Inclusion Analysis")
         col1, col2 = st.columns(2)
         with col1:
-            fig_sat = px.histogram(filtered_df, x="saturation", nbins=20, title="Saturation Distribution")
+            fig_sat = histogram_figure(chart_data, "saturation", title="Saturation Distribution")
             st.plotly_chart(fig_sat, use_container_width=True)
         with col2:
-            fig_qual = px.scatter(
-                filtered_df, 
-                x="avg_processing_time_days", 
-                y="correction_ratio", 
-                color="state", 
+            fig_qual = density_figure(
+                chart_data,
+                "processing_correction",
                 title="Service Quality: Processing Time vs Corrections"
             )
             st.plotly_chart(fig_qual, use_container_width=True)
 
+        # Drill-down from the precomputed rollup cube: no groupby over regions here
+        st.subheader("Regional Rollup")
+        rollup = load_rollup(source)
+        if state_filter == "All":
+            level, parent = "state", ""
+        else:
+            districts = rollup["children"]["district"].get(node_key(state_filter), [])
+            district = st.selectbox("District", ["All"] + [rollup["nodes"][k]["name"] for k in districts])
+            if district == "All":
+                level, parent = "district", node_key(state_filter)
+            else:
+                level, parent = "sub_district", node_key(state_filter, district)
+        nodes = [rollup["nodes"][k] for k in rollup["children"][level].get(parent, [])]
+        st.dataframe(rollup_table(nodes), hide_index=True, use_container_width=True)
+
     with tab3:
         st.header("Risk & Fraud Detection")
         col1, col2 = st.columns(2)
         with col1:
-            fig_risk = px.scatter(
-                filtered_df,
-                x="update_type_entropy",
-                y="updates_per_operator",
-                color="is_anomaly",
-                title="Entropy vs. Operator Load (Bot Detection)",
-                hover_data=["district"]
+            fig_risk = density_figure(
+                chart_data,
+                "entropy_load",
+                title="Entropy vs. Operator Load (Bot Detection)"
             )
             st.plotly_chart(fig_risk, use_container_width=True)
         with col2:
-            fig_risk_dist = px.box(filtered_df, x="state", y="risk_score", title="Risk Score by State")
+            fig_risk_dist = box_figure(chart_data, title="Risk Score by State")
             st.plotly_chart(fig_risk_dist, use_container_width=True)
 
     with tab4:
         st.header("Raw Data Explorer")
+        if len(filtered_df) > EXPLORER_ROWS:
+            st.caption(f"Showing the {EXPLORER_ROWS:,} highest-risk of {len(filtered_df):,} regions.")
+            filtered_df = filtered_df.nlargest(EXPLORER_ROWS, "risk_score")
         st.dataframe(filtered_df, use_container_width=True)
 
 else:
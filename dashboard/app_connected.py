@@ -1,9 +1,12 @@
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
 import requests
-import plotly.express as px
-import plotly.graph_objects as go
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- Configuration ---
 st.set_page_config(
@@ -16,14 +19,51 @@ st.set_page_config(
 # API URL
 import os
 
+# Make the project root importable when launched via `streamlit run dashboard/app_connected.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard.charts import box_figure, density_figure, histogram_figure, rollup_table, top_anomalies
+from modules.rollup import node_key
+
 # API URL
 API_URL = os.getenv("API_URL", "http://localhost:8000/api")
 
+# Explorer fetches: rows per page request, pages requested in parallel, and a cap on rows pulled
+PAGE_SIZE = 50_000
+FETCH_WORKERS = 4
+MAX_EXPLORER_ROWS = 200_000
+
 # --- Helper Functions ---
+@st.cache_resource
+def get_session():
+    """One pooled HTTP session per Streamlit process: keep-alive connections are
+    reused across reruns and by the parallel page fetches."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=FETCH_WORKERS,
+        max_retries=Retry(total=3, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=["GET"]),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=60)
+def fetch_summary(state=None):
+    try:
+        params = {"state": state} if state else {}
+        response = get_session().get(f"{API_URL}/summary", params=params)
+        if response.status_code == 200:
+            return response.json()
+    except:
+        return None
+    return None
+
 @st.cache_data(ttl=60)
-def fetch_summary():
+def fetch_charts(state=None):
+    # Pre-aggregated density grids / histograms / box stats: same size at any region count
     try:
-        response = requests.get(f"{API_URL}/summary")
+        params = {"state": state} if state else {}
+        response = get_session().get(f"{API_URL}/charts", params=params)
         if response.status_code == 200:
             return response.json()
     except:
@@ -31,22 +71,67 @@ def fetch_summary():
     return None
 
 @st.cache_data(ttl=60)
-def fetch_data(limit=1000):
+def fetch_rollup(level, parent=""):
+    # Children of one rollup node, precomputed by the pipeline (population-weighted scores, counts, quantiles)
     try:
-        # Fetching a larger chunk for client-side viz in prototype
-        response = requests.get(f"{API_URL}/regions?limit={limit}")
+        response = get_session().get(f"{API_URL}/rollup", params={"level": level, "parent": parent})
         if response.status_code == 200:
-            data = response.json().get("data", [])
-            return pd.DataFrame(data)
+            return response.json()["nodes"]
     except:
-        return pd.DataFrame()
-    return pd.DataFrame()
+        return None
+    return None
+
+def _fetch_page(params, offset, limit):
+    """One page of /regions as an Arrow IPC stream; returns (table, total, data version)."""
+    response = get_session().get(
+        f"{API_URL}/regions", params=dict(params, offset=offset, limit=limit, format="arrow"), timeout=60
+    )
+    response.raise_for_status()
+    table = pa.ipc.open_stream(response.content).read_all()
+    return table, int(response.headers["X-Total-Count"]), response.headers.get("X-Data-Version")
+
+@st.cache_data(ttl=60, show_spinner="Fetching regions...")
+def fetch_regions(state=None, is_anomaly=None, min_risk=0.0, max_rows=MAX_EXPLORER_ROWS):
+    """
+    Fetches the regions matching the filters (applied by the API), up to `max_rows`.
+    The first page gives the total; the remaining pages are requested concurrently.
+    Each filter combination is cached separately.
+    Returns (DataFrame, total matching rows).
+    """
+    params = {"min_risk": min_risk}
+    if state:
+        params["state"] = state
+    if is_anomaly is not None:
+        params["is_anomaly"] = is_anomaly
+
+    for _ in range(2):
+        try:
+            first, total, version = _fetch_page(params, 0, min(PAGE_SIZE, max_rows))
+            wanted = min(total, max_rows)
+            offsets = range(len(first), wanted, PAGE_SIZE)
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+                pages = list(pool.map(lambda o: _fetch_page(params, o, min(PAGE_SIZE, wanted - o)), offsets))
+        except Exception:
+            return pd.DataFrame(), 0
+        # Offset pages only line up within one data version; start over if it changed mid-fetch
+        if all(page_version == version for _, _, page_version in pages):
+            table = pa.concat_tables([first] + [page for page, _, _ in pages])
+            return table.to_pandas(), total
+    return pd.DataFrame(), 0
 
 def trigger_pipeline():
     try:
-        requests.post(f"{API_URL}/pipeline/run")
-        st.toast("Pipeline started! Data refreshing...", icon="🔄")
-        time.sleep(2)
+        # Queued server-side; a click while a run is in flight joins that run
+        job = get_session().post(f"{API_URL}/pipeline/run").json()
+        st.toast("Pipeline already running, waiting for it..." if job["deduplicated"]
+                 else "Pipeline started! Data refreshing...", icon="🔄")
+        with st.spinner("Running pipeline..."):
+            while job["status"] in ("queued", "running"):
+                time.sleep(2)
+                job = get_session().get(f"{API_URL}/pipeline/jobs/{job['job_id']}").json()
+        if job["status"] == "failed":
+            st.error(f"Pipeline failed: {job['error']}")
+            return
         st.cache_data.clear()
         st.rerun()
     except Exception as e:
@@ -57,6 +142,8 @@ st.sidebar.title("Aadhaar Inclusion Risk Radar")
 
 st.sidebar.header("Filters")
 selected_state = st.sidebar.selectbox("Filter by State", ["All"] + ["Maharashtra", "Uttar Pradesh", "Karnataka", "Tamil Nadu", "Bihar", "West Bengal", "Rajasthan"]) # Hardcoded for prototype speed, ideally fetch from API
+anomalies_only = st.sidebar.checkbox("Anomalies only")
+min_risk = st.sidebar.slider("Minimum Risk Score", 0, 100, 0)
 
 st.sidebar.divider()
 if st.sidebar.button("Run Data Pipeline"):
@@ -68,8 +155,9 @@ st.sidebar.markdown("---")
 # --- Main Page ---
 st.title("Aadhaar Inclusion & Risk Radar")
 
-summary = fetch_summary()
-df = fetch_data(limit=2000)
+state_param = None if selected_state == "All" else selected_state
+summary = fetch_summary(state_param)
+charts = fetch_charts(state_param)
 
 if summary:
     # Top Level Metrics
@@ -82,41 +170,34 @@ else:
     st.warning("Backend API not reachable. Ensure `backend/main.py` is running.")
     st.stop()
 
+if charts is None:
+    st.info(f"No chart data for {selected_state}.")
+    st.stop()
+
 # Tabs
 tab1, tab2, tab3, tab4 = st.tabs(["Overview", "Inclusion Radar", "Risk Radar", "Data Explorer"])
 
 with tab1:
     st.header("Executive Overview")
-    
-    # Filter DF if State selected
-    if selected_state != "All":
-        filtered_df = df[df['state'] == selected_state]
-    else:
-        filtered_df = df
         
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        # Bubble Chart: Inclusion vs Risk
-        fig = px.scatter(
-            filtered_df, 
-            x="inclusion_score", 
-            y="risk_score", 
-            size="population", 
-            color="is_anomaly",
-            hover_name="district",
+        # Density of regions: Inclusion vs Risk, anomalies overlaid
+        fig = density_figure(
+            charts,
+            "inclusion_risk",
             title="District Performance Matrix (Inclusion vs Risk)",
             labels={"inclusion_score": "Inclusion Score (High Good)", "risk_score": "Risk Score (Low Good)"},
-            color_discrete_map={False: "#636EFA", True: "#EF553B"}
         )
         st.plotly_chart(fig, use_container_width=True)
         
     with col2:
         # Anomaly Distribution
         st.subheader("Top Anomalies")
-        anomalies = filtered_df[filtered_df['is_anomaly'] == True].sort_values(by="risk_score", ascending=False).head(10)
+        anomalies = pd.DataFrame(top_anomalies(charts, 10), columns=['district', 'risk_score', 'anomaly_reason'])
         st.dataframe(
-            anomalies[['district', 'risk_score', 'anomaly_reason']], 
+            anomalies, 
             hide_index=True,
             use_container_width=True
         )
@@ -126,19 +207,27 @@ with tab2:
     
     col1, col2 = st.columns(2)
     with col1:
-        fig_sat = px.histogram(filtered_df, x="saturation", nbins=20, title="Saturation Distribution")
+        fig_sat = histogram_figure(charts, "saturation", title="Saturation Distribution")
         st.plotly_chart(fig_sat, use_container_width=True)
         
     with col2:
-        fig_qual = px.scatter(
-            filtered_df, 
-            x="avg_processing_time_days", 
-            y="correction_ratio", 
-            color="state", 
+        fig_qual = density_figure(
+            charts,
+            "processing_correction",
             title="Service Quality: Processing Time vs Corrections"
         )
         st.plotly_chart(fig_qual, use_container_width=True)
 
+    st.subheader("Regional Rollup")
+    if state_param is None:
+        nodes = fetch_rollup("state")
+    else:
+        districts = fetch_rollup("district", node_key(state_param)) or []
+        district = st.selectbox("District", ["All"] + [node["name"] for node in districts])
+        nodes = districts if district == "All" else fetch_rollup("sub_district", node_key(state_param, district))
+    if nodes:
+        st.dataframe(rollup_table(nodes), hide_index=True, use_container_width=True)
+
 with tab3:
     st.header("Risk & Fraud Detection")
     st.markdown("Analyzing anomalous patterns in update requests.")
@@ -146,21 +235,22 @@ with tab3:
     col1, col2 = st.columns(2)
     with col1:
         # Entropy vs Load (The flagging rule)
-        fig_risk = px.scatter(
-            filtered_df,
-            x="update_type_entropy",
-            y="updates_per_operator",
-            color="is_anomaly",
-            title="Entropy vs. Operator Load (Bot Detection)",
-            hover_data=["district"]
+        fig_risk = density_figure(
+            charts,
+            "entropy_load",
+            title="Entropy vs. Operator Load (Bot Detection)"
         )
         st.plotly_chart(fig_risk, use_container_width=True)
         
     with col2:
         st.subheader("Risk Score Distribution")
-        fig_risk_dist = px.box(filtered_df, x="state", y="risk_score", title="Risk Score by State")
+        fig_risk_dist = box_figure(charts, title="Risk Score by State")
         st.plotly_chart(fig_risk_dist, use_container_width=True)
 
 with tab4:
     st.header("Raw Data Explorer")
+    # State, anomaly and risk filters are applied by the API, not here
+    filtered_df, total = fetch_regions(state_param, True if anomalies_only else None, float(min_risk))
+    if total > len(filtered_df):
+        st.caption(f"Showing the first {len(filtered_df):,} of {total:,} matching regions.")
     st.dataframe(filtered_df, use_container_width=True)
@@ -0,0 +1,101 @@
+import pandas as pd
+import plotly.graph_objects as go
+
+# Figures built from pre-aggregated chart data (modules/chart_aggregates.py,
+# served at /api/charts), so rendering cost doesn't grow with the region count.
+
+ANOMALY_COLOR = "#EF553B"
+
+
+def _centers(edges):
+    return [(lo + hi) / 2 for lo, hi in zip(edges[:-1], edges[1:])]
+
+
+def density_figure(charts, name, title, labels=None, hover_name="district"):
+    """Binned region density as a heatmap, with the riskiest anomalies drawn on top as points."""
+    labels = labels or {}
+    grid = charts["density"][name]
+    x_col, y_col = grid["x"], grid["y"]
+    # Empty cells left blank rather than coloured as zero
+    z = [[count or None for count in row] for row in grid["counts"]]
+    fig = go.Figure(go.Heatmap(
+        x=_centers(grid["x_edges"]),
+        y=_centers(grid["y_edges"]),
+        z=z,
+        colorscale="Blues",
+        colorbar=dict(title="Regions"),
+        hovertemplate="%{x:.2f}, %{y:.2f}<br>%{z} regions<extra></extra>",
+        name="Regions",
+    ))
+    anomalies = charts["anomalies"]
+    if anomalies:
+        fig.add_trace(go.Scatter(
+            x=[a[x_col] for a in anomalies],
+            y=[a[y_col] for a in anomalies],
+            mode="markers",
+            marker=dict(color=ANOMALY_COLOR, size=6, line=dict(width=0.5, color="white")),
+            text=[a.get(hover_name) for a in anomalies],
+            customdata=[[a.get("state"), a.get("anomaly_reason")] for a in anomalies],
+            hovertemplate="<b>%{text}</b> (%{customdata[0]})<br>%{customdata[1]}<extra></extra>",
+            name="Anomalies",
+        ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=labels.get(x_col, x_col),
+        yaxis_title=labels.get(y_col, y_col),
+        legend=dict(orientation="h", y=-0.2),
+    )
+    return fig
+
+
+def histogram_figure(charts, column, title):
+    """Pre-binned histogram as a bar chart."""
+    hist = charts["histograms"][column]
+    edges = hist["edges"]
+    fig = go.Figure(go.Bar(
+        x=_centers(edges),
+        y=hist["counts"],
+        width=[hi - lo for lo, hi in zip(edges[:-1], edges[1:])],
+        hovertemplate="%{x:.3f}: %{y} regions<extra></extra>",
+    ))
+    fig.update_layout(title=title, xaxis_title=column, yaxis_title="count", bargap=0.05)
+    return fig
+
+
+def box_figure(charts, title):
+    """Box plot per state from precomputed quartiles and whiskers."""
+    box = charts["box"]
+    states = list(box["by_state"])
+    stats = [box["by_state"][s] for s in states]
+    fig = go.Figure(go.Box(
+        x=states,
+        q1=[s["q1"] for s in stats],
+        median=[s["median"] for s in stats],
+        q3=[s["q3"] for s in stats],
+        lowerfence=[s["lowerfence"] for s in stats],
+        upperfence=[s["upperfence"] for s in stats],
+        mean=[s["mean"] for s in stats],
+        name=box["column"],
+    ))
+    fig.update_layout(title=title, xaxis_title="state", yaxis_title=box["column"])
+    return fig
+
+
+def top_anomalies(charts, n=10):
+    """The overlay is already ranked by risk score, so the top N are its head."""
+    return charts["anomalies"][:n]
+
+
+ROLLUP_COLUMNS = ['name', 'regions', 'total_population', 'weighted_avg_inclusion_score', 'weighted_avg_risk_score',
+                  'anomalies', 'high_risk_regions']
+
+
+def rollup_table(nodes):
+    """Rollup nodes (modules/rollup.py, served at /api/rollup) as one table row each, quantiles flattened."""
+    rows = []
+    for node in nodes:
+        row = {col: node[col] for col in ROLLUP_COLUMNS}
+        for q, value in node["risk_score_quantiles"].items():
+            row[f"risk_score_{q}"] = value
+        rows.append(row)
+    return pd.DataFrame(rows)
@@ -12,8 +12,12 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Make the project root importable when launched via `streamlit run dashboard/demo_app.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.snapshots import live_path
+
 # --- Data Loading Logic (Integrated from Backend) ---
-DATA_PATH = "data/outputs/anomaly_data.parquet"
+DATA_FILE = "anomaly_data.parquet"  # inside the live output snapshot
 
 @st.cache_data(ttl=600)
 def load_data():
@@ -21,7 +25,8 @@ def load_data():
     Loads data directly from parquet file, bypassing the backend API.
     Handles 'Cold Start' by generating mock data if missing.
     """
-    if not os.path.exists(DATA_PATH):
+    data_path = live_path(DATA_FILE)
+    if not os.path.exists(data_path):
         st.warning("Data not found. Generating mock data for the first time... (This may take a minute)")
         try:
             # Attempt to run generation scripts
@@ -49,7 +54,7 @@ def load_data():
             return None
 
     try:
-        return pd.read_parquet(DATA_PATH)
+        return pd.read_parquet(data_path)
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return None
@@ -74,8 +79,7 @@ state_filter = st.sidebar.selectbox("Filter by State", ["All", "Maharashtra", "U
 st.sidebar.divider()
 if st.sidebar.button("Regenerate Data (Reset)"):
     st.cache_data.clear()
-    # Optional: Delete file to force regeneration?
-    # os.remove(DATA_PATH)
+    # Published snapshots are never deleted from here; a new run replaces the live one
     st.rerun()
 
 st.sidebar.markdown("---")
@@ -1,16 +1,98 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import shared_memory
+
 import pandas as pd
 import numpy as np
+from joblib import Parallel, delayed
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
+try:
+    from modules.config import get_section
+    from modules.model_store import ModelNotFoundError, ModelStore, feature_profile, population_stability
+    from modules.quantile_sketch import KLLSketch, load_sketches, save_sketches
+    from modules.schema import ANOMALY_COLUMNS, PARTITION_ANOMALY_COLUMNS, SCORED_COLUMNS, read_columns, select_columns
+    from modules.storage import RISK_SORT, dataset_order, dataset_version, write_arrow_file, write_dataset
+    from modules.summary import write_summary_artifact
+    from modules.chart_aggregates import write_chart_aggregates
+    from modules.movers import write_movers
+    from modules.rollup import write_rollup
+    from modules.snapshots import OUTPUT_ROOT, discard_snapshot, live_dir, publish_snapshot, stage_snapshot
+    from modules.history import append_history
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script: python modules/anomaly_detector.py
+    from config import get_section
+    from model_store import ModelNotFoundError, ModelStore, feature_profile, population_stability
+    from quantile_sketch import KLLSketch, load_sketches, save_sketches
+    from schema import ANOMALY_COLUMNS, PARTITION_ANOMALY_COLUMNS, SCORED_COLUMNS, read_columns, select_columns
+    from storage import RISK_SORT, dataset_order, dataset_version, write_arrow_file, write_dataset
+    from summary import write_summary_artifact
+    from chart_aggregates import write_chart_aggregates
+    from movers import write_movers
+    from rollup import write_rollup
+    from snapshots import OUTPUT_ROOT, discard_snapshot, live_dir, publish_snapshot, stage_snapshot
+    from history import append_history
+    from telemetry import record_bytes
+
+# Features for anomaly detection
+# We focus on the 'risk' related metrics + raw heavy hitters
+FEATURES = [
+    'update_type_entropy',
+    'repeat_update_ratio',
+    'updates_per_operator',
+    'avg_processing_time_days',
+    'rejected_requests'
+]
+
+MODES = ("auto", "fit", "score")
+
+# Columns whose quantiles drive the bot rule, tracked with KLL sketches
+RULE_SKETCH_COLUMNS = ['updates_per_operator', 'update_type_entropy']
+
+def _fit_score_partition(features_shm, scores_shm, n_rows, start, end, params):
+    """Process-pool worker: fits an Isolation Forest on rows [start, end) of the
+    shared feature matrix and writes its anomaly scores into the shared output.
+
+    Only shared-memory names and offsets cross the process boundary.
+    """
+    features = shared_memory.SharedMemory(name=features_shm)
+    scores = shared_memory.SharedMemory(name=scores_shm)
+    try:
+        X = np.ndarray((n_rows, len(FEATURES)), dtype=np.float64, buffer=features.buf)[start:end]
+        out = np.ndarray((n_rows,), dtype=np.float64, buffer=scores.buf)
+        if end - start < 2:
+            out[start:end] = 0.0  # too small to model
+        else:
+            model = IsolationForest(**params).fit(X)
+            out[start:end] = -model.decision_function(X)
+        del X, out  # release the buffer views before closing
+    finally:
+        features.close()
+        scores.close()
+    return end - start
+
 class AnomalyDetector:
-    def __init__(self, input_path="data/outputs/scored_data.parquet"):
+    def __init__(self, input_path="data/outputs/scored_data.parquet", mode="auto", model_dir=None):
+        """`mode` controls the Isolation Forest: "fit" always retrains, "score" only
+        scores against the saved model, "auto" reuses the saved model unless it is
+        missing, older than anomaly.retrain_every_days, or the data has drifted."""
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
         self.input_path = input_path
+        self.mode = mode
+        self.settings = get_section("anomaly")
+        self.store = ModelStore(model_dir or self.settings.get("model_dir", "data/models/isolation_forest"),
+                                keep=self.settings.get("keep_models", 5))
+        self.model_version = None
         self.df = None
 
     def load_data(self):
+        """Loads the scored columns (features, identity, scores) with compact dtypes."""
         try:
-            self.df = pd.read_parquet(self.input_path)
+            self.df = read_columns(self.input_path, SCORED_COLUMNS)
+            record_bytes("read", self.input_path, "load_scored", columns=SCORED_COLUMNS)
             print(f"AnomalyDetector: Loaded data with shape: {self.df.shape}")
             return self.df
         except Exception as e:
@@ -21,32 +103,35 @@ class AnomalyDetector:
         if self.df is None:
             raise ValueError("Data not loaded")
 
-        # Features for anomaly detection
-        # We focus on the 'risk' related metrics + raw heavy hitters
-        features = [
-            'update_type_entropy',
-            'repeat_update_ratio',
-            'updates_per_operator',
-            'avg_processing_time_days',
-            'rejected_requests'
-        ]
-        
-        # Prepare data
-        X = self.df[features].fillna(0)
-        
         # --- Method 1: Isolation Forest (Global Anomalies) ---
         print("Running Isolation Forest...")
-        iso_forest = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
-        self.df['anomaly_score_if'] = iso_forest.fit_predict(X)
+        # Train on an (optionally subsampled) feature matrix; scoring reads the
+        # frame in chunks, so the full feature matrix is never materialised.
+        model = self._get_model(self._training_matrix())
+        decision = self.decision_scores(model, self.df)
+        # Same labels as IsolationForest.predict: negative decision score -> -1
+        self.df['anomaly_score_if'] = np.where(decision < 0, -1, 1).astype(np.int8)
+        # Continuous score for ranking: higher = more anomalous, > 0 is flagged
+        self.df['anomaly_score'] = -decision
         self.df['is_anomaly_if'] = self.df['anomaly_score_if'] == -1
         
+        # --- Method 1b: Per-partition Isolation Forests (Local Anomalies) ---
+        # Optional: catches outliers in small states that the global model swamps
+        partition_col = self.settings.get("partition_by")
+        if partition_col:
+            self.df['anomaly_score_partition'] = self.detect_partitioned(partition_col)
+            self.df['is_anomaly_partition'] = self.df['anomaly_score_partition'] > 0
+        
         # --- Method 2: Statistical Heuristics (Domain Specific) ---
         # Rule: Low Entropy AND High Load -> Bot/Script Attack?
         # Rule: High Rejection AND High Processing Time -> Inefficiency/Grievance
         
         # Define Thresholds (e.g., top 98th percentile is anomalous)
-        high_load_thresh = self.df['updates_per_operator'].quantile(0.98)
-        low_entropy_thresh = self.df['update_type_entropy'].quantile(0.02)
+        # Quantiles come from mergeable KLL sketches (within +/- rank_error(k) of
+        # the exact rank), so chunked or partitioned runs never need a full column.
+        sketches = self._rule_sketches()
+        high_load_thresh = sketches['updates_per_operator'].quantile(0.98)
+        low_entropy_thresh = sketches['update_type_entropy'].quantile(0.02)
         
         self.df['is_anomaly_rule_bot'] = (
             (self.df['updates_per_operator'] > high_load_thresh) & 
@@ -55,25 +140,244 @@ class AnomalyDetector:
         
         # Combine
         self.df['is_anomaly'] = self.df['is_anomaly_if'] | self.df['is_anomaly_rule_bot']
+        if partition_col:
+            self.df['is_anomaly'] |= self.df['is_anomaly_partition']
         
-        # Assign Reasons
-        self.df['anomaly_reason'] = "Normal"
-        self.df.loc[self.df['is_anomaly_if'], 'anomaly_reason'] = "Statistical Outlier"
-        self.df.loc[self.df['is_anomaly_rule_bot'], 'anomaly_reason'] = "High Load + Low Entropy (Bot?)"
+        # Assign Reasons (first match wins: bot rule, then global, then local outlier)
+        reasons = ["High Load + Low Entropy (Bot?)", "Statistical Outlier"]
+        conditions = [self.df['is_anomaly_rule_bot'], self.df['is_anomaly_if']]
+        if partition_col:
+            reasons.append(f"Local Outlier (within {partition_col})")
+            conditions.append(self.df['is_anomaly_partition'])
+        reasons.append("Normal")
+        codes = np.select(conditions, np.arange(len(conditions)), default=len(conditions)).astype(np.int8)
+        self.df['anomaly_reason'] = pd.Categorical.from_codes(codes, categories=reasons)
         
         count = self.df['is_anomaly'].sum()
         print(f"Detected {count} anomalies out of {len(self.df)} regions.")
         
         return self.df
 
-    def save_anomalies(self, output_path="data/outputs/anomaly_data.parquet"):
-        import os
+    def detect_partitioned(self, partition_col="state"):
+        """Trains and scores one Isolation Forest per value of `partition_col`.
+
+        Rows are grouped by partition into one float64 feature matrix in shared
+        memory; each process-pool task gets only the segment offsets, fits on
+        its segment and writes scores into a shared output array. Returns the
+        per-partition anomaly score (higher = more anomalous, > 0 is flagged)
+        aligned with self.df.
+        """
+        codes, uniques = pd.factorize(self.df[partition_col])
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(-1, len(uniques)), side="left")
+        bounds = np.append(bounds, len(order))
+        n_rows = len(self.df)
+        params = {
+            "n_estimators": self.settings.get("n_estimators", 100),
+            "max_samples": self.settings.get("max_samples", "auto"),
+            "contamination": 0.05,
+            "random_state": 42,
+        }
+
+        features_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * len(FEATURES) * 8, 1))
+        scores_shm = shared_memory.SharedMemory(create=True, size=max(n_rows * 8, 1))
+        try:
+            X = np.ndarray((n_rows, len(FEATURES)), dtype=np.float64, buffer=features_shm.buf)
+            for j, col in enumerate(FEATURES):
+                X[:, j] = self.df[col].to_numpy(dtype=np.float64)[order]
+            np.nan_to_num(X, copy=False, nan=0.0)
+            scores = np.ndarray((n_rows,), dtype=np.float64, buffer=scores_shm.buf)
+
+            # Segment 0 holds rows with a missing partition value (code -1)
+            segments = [(int(bounds[i]), int(bounds[i + 1])) for i in range(len(bounds) - 1)]
+            segments = [(start, end) for start, end in segments if end > start]
+            workers = self.settings.get("partition_workers") or os.cpu_count() or 1
+            print(f"Training {len(segments)} per-{partition_col} Isolation Forests on {workers} processes...")
+            with ProcessPoolExecutor(max_workers=min(workers, max(len(segments), 1))) as pool:
+                futures = [
+                    pool.submit(_fit_score_partition, features_shm.name, scores_shm.name, n_rows, start, end, params)
+                    for start, end in segments
+                ]
+                for future in futures:
+                    future.result()
+
+            result = np.empty(n_rows, dtype=np.float64)
+            result[order] = scores
+            del X, scores
+            return result
+        finally:
+            features_shm.close()
+            features_shm.unlink()
+            scores_shm.close()
+            scores_shm.unlink()
+
+    @property
+    def sketch_path(self):
+        return os.path.join(self.store.model_dir, "rule_sketches.json")
+
+    def build_rule_sketches(self, data):
+        """One KLL sketch per rule column, built chunk by chunk and merged."""
+        k = self.settings.get("sketch_k", 400)
+        batch_size = self.settings.get("score_batch_size", 100_000)
+        sketches = {col: KLLSketch(k=k) for col in RULE_SKETCH_COLUMNS}
+        for start in range(0, len(data), batch_size):
+            for col in RULE_SKETCH_COLUMNS:
+                # A per-chunk sketch, as a partition in a distributed run would build
+                chunk = KLLSketch(k=k, seed=start).update(data[col].iloc[start:start + batch_size].to_numpy())
+                sketches[col].merge(chunk)
+        return sketches
+
+    def _rule_sketches(self):
+        """Persisted sketches in mode="score" (thresholds reused), else rebuilt and saved."""
+        if self.mode == "score":
+            sketches = load_sketches(self.sketch_path)
+            if sketches is not None:
+                return sketches
+        sketches = self.build_rule_sketches(self.df)
+        save_sketches(sketches, self.sketch_path)
+        return sketches
+
+    def _training_matrix(self):
+        """Feature matrix to train on: all rows, or anomaly.fit_sample_size random rows."""
+        sample_size = self.settings.get("fit_sample_size")
+        cols = [self.df.columns.get_loc(c) for c in FEATURES]
+        if sample_size and len(self.df) > sample_size:
+            rows = np.sort(np.random.default_rng(42).choice(len(self.df), sample_size, replace=False))
+            return self.df.iloc[rows, cols].fillna(0)
+        return self.df.iloc[:, cols].fillna(0)
+
+    def _fit_model(self, X, reason):
+        print(f"Training Isolation Forest on {len(X)} rows ({reason})...")
+        model = IsolationForest(
+            n_estimators=self.settings.get("n_estimators", 100),
+            max_samples=self.settings.get("max_samples", "auto"),
+            contamination=0.05,
+            random_state=42,
+            n_jobs=self.settings.get("n_jobs"),  # trees are built in parallel
+        )
+        model.fit(X)
+        self.model_version = self.store.save(model, {
+            "features": list(X.columns),
+            "n_samples": len(X),
+            "params": model.get_params(),
+            "profile": feature_profile(X),
+        })
+        print(f"Saved Isolation Forest model version {self.model_version}")
+        return model
+
+    def _get_model(self, X):
+        """Loads the saved model or (re)trains it, depending on self.mode."""
+        if self.mode == "fit":
+            return self._fit_model(X, "mode=fit")
+
+        model, metadata = self.store.load()
+        if model is None or metadata.get("features") != list(X.columns):
+            if self.mode == "score":
+                raise ModelNotFoundError(f"No saved model with features {list(X.columns)} in {self.store.model_dir}")
+            return self._fit_model(X, "no compatible saved model")
+
+        self.model_version = metadata["version"]
+        if self.mode == "auto":
+            age_days = (datetime.now(timezone.utc) - datetime.fromisoformat(metadata["trained_at"])).days
+            max_age = self.settings.get("retrain_every_days", 7)
+            if max_age is not None and age_days >= max_age:
+                return self._fit_model(X, f"model is {age_days} days old")
+            psi = population_stability(metadata["profile"], X)
+            if psi > self.settings.get("drift_psi_threshold", 0.25):
+                return self._fit_model(X, f"feature drift, PSI={psi:.3f}")
+        print(f"Scoring with saved Isolation Forest model version {self.model_version}")
+        return model
+
+    def decision_scores(self, model, data):
+        """IsolationForest.decision_function over `data` in batches, run on a thread pool.
+
+        Each batch copies only its own rows of the model's feature columns, so
+        the full feature matrix is never duplicated in memory.
+        """
+        features = list(getattr(model, "feature_names_in_", FEATURES))
+        cols = [data.columns.get_loc(c) for c in features]
+        batch_size = self.settings.get("score_batch_size", 100_000)
+
+        def score_batch(start):
+            return model.decision_function(data.iloc[start:start + batch_size, cols].fillna(0))
+
+        starts = range(0, len(data), batch_size)
+        if len(starts) <= 1:
+            return score_batch(0)
+        parts = Parallel(n_jobs=self.settings.get("n_jobs", -1), prefer="threads")(
+            delayed(score_batch)(start) for start in starts
+        )
+        return np.concatenate(parts)
+
+    def score_regions(self, regions):
+        """Scores arbitrary region rows (e.g. a single region) against the saved model.
+
+        Returns a DataFrame with the decision score (negative = anomalous) and the
+        Isolation Forest flag, without retraining or touching self.df. Raises
+        ModelNotFoundError without a saved model, and ValueError for features
+        the model doesn't use or non-finite values.
+        """
+        model, metadata = self.store.load()
+        if model is None:
+            raise ModelNotFoundError(f"No saved model in {self.store.model_dir}; run the pipeline first")
+        unknown = sorted(set(regions.columns) - set(metadata["features"]))
+        if unknown:
+            raise ValueError(f"Unknown features {unknown}; the model uses {metadata['features']}")
+        X = regions.reindex(columns=metadata["features"]).fillna(0)
+        if not np.isfinite(X.to_numpy(dtype=np.float64)).all():
+            raise ValueError("Feature values must be finite")
+        scores = self.decision_scores(model, X)
+        return pd.DataFrame({
+            "decision_score": scores,
+            "is_anomaly_if": scores < 0,
+            "model_version": metadata["version"],
+        }, index=regions.index)
+
+    def save_anomalies(self, output_path="data/outputs/anomaly_data.parquet", arrow_path=None):
+        """Writes the parquet dataset, then (with `arrow_path`) an Arrow IPC copy of it
+        that API workers memory-map instead of each decoding the parquet."""
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        self.df.to_parquet(output_path, index=False)
+        output = select_columns(self.df, ANOMALY_COLUMNS, PARTITION_ANOMALY_COLUMNS)
+        # Partitioned by state and sorted by risk, so state/risk filters prune partitions and row groups;
+        # the Arrow copy is written in the same order, so both reads return identical rows
+        output = dataset_order(output, RISK_SORT)
+        write_dataset(output, output_path, sort_by=RISK_SORT)
+        record_bytes("written", output_path, "save")
         print(f"Saved anomaly data to {output_path}")
+        if arrow_path:
+            write_arrow_file(output, arrow_path, data_version=dataset_version(output_path))
+            record_bytes("written", arrow_path, "save")
+            print(f"Published memory-mappable copy to {arrow_path}")
 
 if __name__ == "__main__":
-    detector = AnomalyDetector()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Flag anomalous regions.")
+    parser.add_argument("--mode", choices=MODES, default="auto",
+                        help="auto: reuse the saved model unless stale/drifted; fit: always retrain; "
+                             "score: only use the saved model")
+    args = parser.parse_args()
+
+    detector = AnomalyDetector(mode=args.mode)
     detector.load_data()
     detector.detect_anomalies()
-    detector.save_anomalies()
+    # Final outputs go live together as one snapshot (see modules/snapshots.py)
+    previous_dir = live_dir(OUTPUT_ROOT)
+    snapshot, run_dir = stage_snapshot(OUTPUT_ROOT)
+    try:
+        data_path = os.path.join(run_dir, "anomaly_data.parquet")
+        detector.save_anomalies(data_path, arrow_path=os.path.join(run_dir, "anomaly_data.arrow"))
+        write_summary_artifact(detector.df, data_path, os.path.join(run_dir, "summary.json"),
+                               top_k=get_section("pipeline").get("top_k_anomalies", 100))
+        dashboard = get_section("dashboard")
+        write_chart_aggregates(detector.df, data_path, os.path.join(run_dir, "charts.json"),
+                               bins=dashboard.get("density_bins", 80),
+                               max_points=dashboard.get("max_overlay_points", 2000))
+        write_rollup(detector.df, data_path, os.path.join(run_dir, "rollup.json"))
+        write_movers(detector.df, previous_dir, data_path, os.path.join(run_dir, "movers.json"),
+                     top_k=get_section("pipeline").get("top_k_movers", 50))
+    except Exception:
+        discard_snapshot(run_dir)
+        raise
+    publish_snapshot(snapshot, run_dir, OUTPUT_ROOT, keep=get_section("pipeline").get("keep_snapshots", 3))
+    append_history(detector.df, run_id=snapshot)
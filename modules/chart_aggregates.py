@@ -0,0 +1,156 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from modules.storage import dataset_version
+    from modules.summary import records
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script from modules/
+    from storage import dataset_version
+    from summary import records
+    from telemetry import record_bytes
+
+CHARTS_PATH = "data/outputs/charts.json"
+
+# 2D density grids behind the dashboard scatter plots: name -> (x column, y column)
+DENSITY_CHARTS = {
+    "inclusion_risk": ("inclusion_score", "risk_score"),
+    "entropy_load": ("update_type_entropy", "updates_per_operator"),
+    "processing_correction": ("avg_processing_time_days", "correction_ratio"),
+}
+# 1D histograms: column -> number of bins
+HISTOGRAMS = {"saturation": 20}
+BOX_COLUMN = "risk_score"
+
+# Bin ranges stop at these quantiles so a handful of extreme regions can't squash
+# the grid into a few cells; those regions are clipped into the edge bins (and,
+# if flagged, still appear individually in the anomaly overlay).
+RANGE_QUANTILES = (0.001, 0.999)
+
+OVERLAY_COLUMNS = ['region_id', 'state', 'district', 'population', 'risk_score', 'anomaly_reason'] + sorted(
+    {col for pair in DENSITY_CHARTS.values() for col in pair} - {'risk_score'}
+)
+
+
+def _edges(values, bins):
+    finite = values[np.isfinite(values)]
+    lo, hi = np.quantile(finite, RANGE_QUANTILES) if len(finite) else (0.0, 1.0)
+    if hi <= lo:
+        hi = lo + 1.0
+    return np.linspace(lo, hi, bins + 1)
+
+
+def _bin_index(values, edges):
+    """Bin of each value (clipped into the edge bins); -1 for NaN."""
+    bins = len(edges) - 1
+    idx = np.floor((values - edges[0]) / (edges[-1] - edges[0]) * bins)
+    idx = np.clip(np.nan_to_num(idx, nan=0), 0, bins - 1).astype(np.int64)
+    idx[np.isnan(values)] = -1
+    return idx
+
+
+def _grouped_bincount(groups, n_groups, cells, n_cells):
+    """(n_groups, n_cells) counts; cells of -1 are skipped."""
+    valid = cells >= 0
+    counts = np.bincount(groups[valid] * n_cells + cells[valid], minlength=n_groups * n_cells)
+    return counts.reshape(n_groups, n_cells)
+
+
+def _box_stats(values):
+    """Precomputed box-plot statistics (Tukey whiskers) for one group."""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    return {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        # Furthest points still within 1.5 IQR of the box
+        "lowerfence": float(values[values >= q1 - 1.5 * iqr].min()),
+        "upperfence": float(values[values <= q3 + 1.5 * iqr].max()),
+    }
+
+
+def build_chart_aggregates(df, bins=80, max_points=2000, data_version=None):
+    """Everything the dashboard charts need, with size independent of len(df).
+
+    For the whole frame and for each state: density grids (`counts[y][x]`, one
+    row per y bin) over shared bin edges, histograms, per-state risk box-plot
+    quantiles and the `max_points` riskiest anomalies as an overlay. Edges are
+    computed once over all regions so per-state grids line up with the global one.
+    """
+    codes, states = pd.factorize(df['state'])
+    n_states = len(states)
+    groups = np.where(codes < 0, n_states, codes)  # missing state: counted globally only
+    n_groups = n_states + 1
+    group_sizes = np.bincount(groups, minlength=n_groups)
+
+    density = {}
+    for name, (x_col, y_col) in DENSITY_CHARTS.items():
+        x = df[x_col].to_numpy(dtype=np.float64)
+        y = df[y_col].to_numpy(dtype=np.float64)
+        x_edges, y_edges = _edges(x, bins), _edges(y, bins)
+        ix, iy = _bin_index(x, x_edges), _bin_index(y, y_edges)
+        cells = np.where((ix >= 0) & (iy >= 0), iy * bins + ix, -1)
+        counts = _grouped_bincount(groups, n_groups, cells, bins * bins).reshape(n_groups, bins, bins)
+        density[name] = (x_col, y_col, x_edges, y_edges, counts)
+
+    histograms = {}
+    for col, n_bins in HISTOGRAMS.items():
+        values = df[col].to_numpy(dtype=np.float64)
+        edges = _edges(values, n_bins)
+        histograms[col] = (edges, _grouped_bincount(groups, n_groups, _bin_index(values, edges), n_bins))
+
+    box_values = df[BOX_COLUMN].to_numpy(dtype=np.float64)
+    boxes = {str(state): _box_stats(box_values[groups == g]) for g, state in enumerate(states)}
+
+    anomalies = df.loc[df['is_anomaly'].to_numpy(dtype=bool), OVERLAY_COLUMNS]
+    anomalies = anomalies.sort_values(by='risk_score', ascending=False, kind="stable")
+
+    def scope(select, box_states, overlay):
+        return {
+            "count": int(select(group_sizes)),
+            "density": {
+                name: {"x": x_col, "y": y_col, "x_edges": x_edges.tolist(), "y_edges": y_edges.tolist(),
+                       "counts": select(counts).tolist()}
+                for name, (x_col, y_col, x_edges, y_edges, counts) in density.items()
+            },
+            "histograms": {
+                col: {"edges": edges.tolist(), "counts": select(counts).tolist()}
+                for col, (edges, counts) in histograms.items()
+            },
+            "box": {"column": BOX_COLUMN, "by_state": {s: boxes[s] for s in box_states if boxes[s] is not None}},
+            "anomalies": records(overlay.head(max_points)),
+        }
+
+    by_state = {}
+    for g, state in enumerate(states):
+        state = str(state)
+        by_state[state] = scope(lambda a, g=g: a[g], [state], anomalies[anomalies['state'] == state])
+    return {
+        "data_version": list(data_version) if data_version is not None else None,
+        "bins": bins,
+        "max_points": max_points,
+        "global": scope(lambda a: a.sum(axis=0), sorted(boxes), anomalies),
+        "by_state": dict(sorted(by_state.items())),
+    }
+
+
+def write_chart_aggregates(df, data_path, output_path=CHARTS_PATH, bins=80, max_points=2000):
+    """Builds the chart aggregates for the dataset just saved at `data_path` and writes them as JSON."""
+    charts = build_chart_aggregates(df, bins=bins, max_points=max_points, data_version=dataset_version(data_path))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(charts, f)
+    os.replace(tmp_path, output_path)
+    record_bytes("written", output_path, "aggregate_charts")
+    print(f"Saved chart aggregates to {output_path}")
+    return charts
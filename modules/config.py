@@ -0,0 +1,15 @@
+import yaml
+
+CONFIG_PATH = "config/settings.yaml"
+
+def load_config(path=CONFIG_PATH):
+    """Loads settings.yaml, returning an empty dict if it is missing or unreadable."""
+    try:
+        with open(path, "r") as f:
+            return yaml.safe_load(f) or {}
+    except Exception:
+        return {}
+
+def get_section(name, path=CONFIG_PATH):
+    """Returns one top-level section of settings.yaml (or {} if absent)."""
+    return load_config(path).get(name) or {}
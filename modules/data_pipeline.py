@@ -1,6 +1,24 @@
 import pandas as pd
 import numpy as np
 from scipy.stats import entropy
+from scipy.special import entr
+
+try:
+    from modules.config import get_section
+    from modules.schema import (
+        CATEGORY_COLUMNS, PIPELINE_INPUT_COLUMNS, PROCESSED_COLUMNS, UPDATE_TYPE_COLS,
+        compact_dtypes, read_columns, select_columns,
+    )
+    from modules.storage import DatasetWriter, write_dataset
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script: python modules/data_pipeline.py
+    from config import get_section
+    from schema import (
+        CATEGORY_COLUMNS, PIPELINE_INPUT_COLUMNS, PROCESSED_COLUMNS, UPDATE_TYPE_COLS,
+        compact_dtypes, read_columns, select_columns,
+    )
+    from storage import DatasetWriter, write_dataset
+    from telemetry import record_bytes
 
 class DataPipeline:
     def __init__(self, input_path="data/inputs/aadhaar_mock_data.parquet"):
@@ -8,9 +26,10 @@ class DataPipeline:
         self.df = None
         
     def load_data(self):
-        """Loads data from parquet file."""
+        """Loads the columns the pipeline uses from the parquet file, with compact dtypes."""
         try:
-            self.df = pd.read_parquet(self.input_path)
+            self.df = read_columns(self.input_path, PIPELINE_INPUT_COLUMNS)
+            record_bytes("read", self.input_path, "load", columns=PIPELINE_INPUT_COLUMNS)
             print(f"Loaded data with shape: {self.df.shape}")
             return self.df
         except Exception as e:
@@ -22,14 +41,21 @@ class DataPipeline:
         if self.df is None:
             raise ValueError("Data not loaded. Call load_data() first.")
             
-        # Fill missing values
-        self.df.fillna(0, inplace=True)
+        self._clean(self.df)
+        return self.df
+
+    @staticmethod
+    def _clean(df):
+        """Fills missing values, clips numeric columns at 0 and compacts dtypes, in place."""
+        # Fill missing values (categoricals keep NaN: 0 is not one of their categories)
+        for col in df.columns.difference(CATEGORY_COLUMNS, sort=False):
+            if df[col].hasnans:
+                df[col] = df[col].fillna(0)
         
         # Ensure non-negative
-        numerical_cols = self.df.select_dtypes(include=[np.number]).columns
-        self.df[numerical_cols] = self.df[numerical_cols].clip(lower=0)
-        
-        return self.df
+        numerical_cols = df.select_dtypes(include=[np.number]).columns
+        df[numerical_cols] = df[numerical_cols].clip(lower=0)
+        return compact_dtypes(df)
 
     def _calculate_entropy(self, row):
         """Calculates Shannon entropy of update types."""
@@ -45,44 +71,118 @@ class DataPipeline:
         probs = [c / total for c in counts]
         return entropy(probs, base=2)
 
+    @staticmethod
+    def _entropy_matrix(counts):
+        """Shannon entropy (base 2) of each row of an (n, k) count matrix.
+
+        Columnar equivalent of `_calculate_entropy`: rows with a zero total get 0.
+        """
+        counts = np.asarray(counts, dtype=np.float64)
+        totals = counts.sum(axis=1, keepdims=True)
+        nonzero = totals[:, 0] > 0
+        probs = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+        # entr(p) = -p * ln(p), with entr(0) = 0 -- same kernel scipy.stats.entropy uses
+        result = entr(probs).sum(axis=1) / np.log(2)
+        result[~nonzero] = 0.0
+        return result
+
     def feature_engineering(self):
         """Creates derived features for scoring."""
         if self.df is None:
             raise ValueError("Data not loaded.")
             
+        self._add_features(self.df)
+        print("Feature engineering completed.")
+        return self.df
+
+    @classmethod
+    def _add_features(cls, df):
+        """Adds the derived feature columns to df, in place."""
         # 1. Update Type Entropy
         # Low entropy -> dominance of one update type (potential fraud/gaming)
-        self.df['update_type_entropy'] = self.df.apply(self._calculate_entropy, axis=1)
+        df['update_type_entropy'] = cls._entropy_matrix(df[UPDATE_TYPE_COLS].to_numpy())
         
         # 2. Correction Ratio (Quality Metric)
-        self.df['correction_ratio'] = self.df['rejected_requests'] / self.df['update_requests_total'].replace(0, 1)
+        df['correction_ratio'] = df['rejected_requests'] / df['update_requests_total'].replace(0, 1)
         
         # 3. Repeat Update Ratio Proxy (Simulated as function of rejection for now as we lack individual tx data)
         # In real scenario, this would come from tx level logs
-        self.df['repeat_update_ratio'] = (self.df['rejected_requests'] * 1.5) / self.df['update_requests_total'].replace(0, 1)
-        self.df['repeat_update_ratio'] = self.df['repeat_update_ratio'].clip(upper=1.0)
+        df['repeat_update_ratio'] = (df['rejected_requests'] * 1.5) / df['update_requests_total'].replace(0, 1)
+        df['repeat_update_ratio'] = df['repeat_update_ratio'].clip(upper=1.0)
         
         # 4. Saturation
-        self.df['saturation'] = self.df['aadhaar_generated'] / self.df['population'].replace(0, 1)
+        df['saturation'] = df['aadhaar_generated'] / df['population'].replace(0, 1)
         
         # 5. Anomaly Susceptibility (heuristic)
         # High volume + low operators = suspicious
-        self.df['updates_per_operator'] = self.df['update_requests_total'] / self.df['operator_count'].replace(0, 1)
-        
-        print("Feature engineering completed.")
-        return self.df
+        df['updates_per_operator'] = df['update_requests_total'] / df['operator_count'].replace(0, 1)
+        return df
         
     def save_processed(self, output_path="data/outputs/processed_data.parquet"):
-        """Saves processed dataframe."""
+        """Saves the processed dataframe as a state-partitioned parquet dataset."""
         import os
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        self.df.to_parquet(output_path, index=False)
+        write_dataset(select_columns(self.df, PROCESSED_COLUMNS), output_path)
+        record_bytes("written", output_path, "save_processed")
         print(f"Saved processed data to {output_path}")
 
+    def process_streaming(self, output_path="data/outputs/processed_data.parquet", batch_size=100_000):
+        """Out-of-core variant of load -> preprocess -> feature_engineering -> save.
+
+        Reads the input in record batches of at most `batch_size` rows, cleans and
+        derives features per batch, and appends each batch to the state-partitioned
+        dataset at `output_path`. Peak memory is bounded by the batch size (plus one
+        decoded input row group and one buffered row group per state), not by the
+        size of the input file.
+        """
+        import os
+        import pyarrow.parquet as pq
+
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        columns = [c for c in PIPELINE_INPUT_COLUMNS if c in pq.read_schema(self.input_path).names]
+        source = pq.ParquetFile(self.input_path, read_dictionary=[c for c in CATEGORY_COLUMNS if c in columns])
+        print(f"Streaming {source.metadata.num_rows} rows from {self.input_path} "
+              f"({source.metadata.num_row_groups} row groups, batch size {batch_size})")
+
+        writer = DatasetWriter(output_path)
+        n_rows = 0
+        try:
+            for batch in source.iter_batches(batch_size=batch_size, columns=columns):
+                chunk = batch.to_pandas()
+                self._clean(chunk)
+                self._add_features(chunk)
+                writer.write(select_columns(chunk, PROCESSED_COLUMNS))
+                n_rows += len(chunk)
+            if n_rows == 0:
+                raise ValueError(f"No rows found in {self.input_path}")
+        except Exception:
+            writer.abort()
+            raise
+        writer.close()
+
+        record_bytes("read", self.input_path, "process_streaming", columns=columns)
+        record_bytes("written", output_path, "process_streaming")
+        self.df = None
+        print(f"Saved processed data ({n_rows} rows) to {output_path}")
+        return n_rows
+
 if __name__ == "__main__":
-    # Test run
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Clean input data and derive scoring features.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process the input out-of-core in record batches")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Rows per batch in streaming mode (default: pipeline.stream_batch_size)")
+    args = parser.parse_args()
+
     pipeline = DataPipeline()
-    pipeline.load_data()
-    pipeline.preprocess()
-    pipeline.feature_engineering()
-    pipeline.save_processed()
+    if args.stream:
+        batch_size = args.batch_size or get_section("pipeline").get("stream_batch_size", 100_000)
+        pipeline.process_streaming(batch_size=batch_size)
+    else:
+        # Test run
+        pipeline.load_data()
+        pipeline.preprocess()
+        pipeline.feature_engineering()
+        pipeline.save_processed()
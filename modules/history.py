@@ -0,0 +1,326 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+try:
+    from modules.config import get_section
+    from modules.storage import COMPRESSION
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script from modules/
+    from config import get_section
+    from storage import COMPRESSION
+    from telemetry import record_bytes
+
+# Append-only score history, one row per region per pipeline run:
+#
+#   <path>/run_date=YYYY-MM-DD/run-<run_id>.parquet   one file per run, sorted by region_id
+#   <path>/run_month=YYYY-MM/part-0.parquet           a closed month's runs, sorted by (region_id, run_at)
+#
+# A month file lists the run_ids it holds in its metadata; a daily file is
+# only hidden (and later deleted) once its run is listed there, so a run that
+# lands after its month was compacted is merged in by the next compaction.
+#
+# Every file is region-sorted, so the row groups that can hold a region are
+# found from footer min/max stats. Once a month is over its daily files are
+# merged into one month file; a lookup then reads about one row group per
+# month instead of one per run, so it stays fast as years of runs pile up.
+HISTORY_PATH = "data/outputs/history.parquet"
+DAY_PARTITION = "run_date"
+MONTH_PARTITION = "run_month"
+DEFAULT_ROW_GROUP_SIZE = 4096
+DEFAULT_MONTH_ROW_GROUP_SIZE = 16384
+# Month file metadata key listing the run_ids merged into it
+COMPACTED_RUNS_KEY = b"airr.compacted_runs"
+
+# Region attributes that don't change between runs (state, district) are left
+# to the current dataset; history keeps what a run decides.
+HISTORY_COLUMNS = ['region_id', 'inclusion_score', 'risk_score', 'anomaly_score', 'is_anomaly', 'anomaly_reason']
+RUN_COLUMNS = ['run_id', 'run_at']
+# Dictionary-encoded, with indices wide enough for any number of runs in one month file
+RUN_ID_TYPE = pa.dictionary(pa.int32(), pa.string())
+
+
+def history_path():
+    return get_section("data").get("history_path", HISTORY_PATH)
+
+
+def _write_atomic(table, file_path, row_group_size):
+    tmp_path = file_path + ".tmp"
+    pq.write_table(table, tmp_path, row_group_size=row_group_size, compression=COMPRESSION, write_statistics=True)
+    os.replace(tmp_path, file_path)
+
+
+def append_history(df, run_id, run_at=None, path=None, row_group_size=None):
+    """Appends one run's per-region scores and flags to the history dataset.
+
+    The file is written under a temporary name and renamed into its run-date
+    partition, so readers never see a partial run. Months that have ended are
+    then compacted (see `compact_history`). Returns the new file's path.
+    """
+    path = path or history_path()
+    run_at = run_at or datetime.now(timezone.utc)
+    config = get_section("data")
+    row_group_size = row_group_size or config.get("history_row_group_size", DEFAULT_ROW_GROUP_SIZE)
+
+    table = pa.Table.from_pandas(df[HISTORY_COLUMNS], preserve_index=False)
+    table = table.take(pc.sort_indices(table, [("region_id", "ascending")]))
+    n = table.num_rows
+    table = table.append_column("run_id", pa.DictionaryArray.from_arrays(
+        pa.array(np.zeros(n, dtype=np.int32)), pa.array([str(run_id)])))
+    table = table.append_column("run_at", pa.array(
+        np.full(n, int(run_at.timestamp() * 1_000_000), dtype=np.int64), pa.timestamp("us", tz="UTC")))
+
+    partition = os.path.join(path, f"{DAY_PARTITION}={run_at.date().isoformat()}")
+    os.makedirs(partition, exist_ok=True)
+    file_path = os.path.join(partition, f"run-{run_id}.parquet")
+    _write_atomic(table, file_path, row_group_size)
+    record_bytes("written", file_path, "record_history")
+    print(f"Appended {n} regions to history at {file_path}")
+
+    compact_history(path, before=run_at.date().replace(day=1),
+                    row_group_size=config.get("history_month_row_group_size", DEFAULT_MONTH_ROW_GROUP_SIZE))
+    return file_path
+
+
+def _list_partitions(path):
+    """[(kind, first day, last day, directory)] for every day/month partition under path."""
+    try:
+        names = os.listdir(path)
+    except FileNotFoundError:
+        return []
+    partitions = []
+    for name in names:
+        key, _, value = name.partition("=")
+        try:
+            if key == DAY_PARTITION:
+                day = date.fromisoformat(value)
+                partitions.append((DAY_PARTITION, day, day, os.path.join(path, name)))
+            elif key == MONTH_PARTITION:
+                first = date.fromisoformat(value + "-01")
+                last = (pd.Timestamp(first) + pd.offsets.MonthEnd(0)).date()
+                partitions.append((MONTH_PARTITION, first, last, os.path.join(path, name)))
+        except ValueError:
+            continue
+    return sorted(partitions, key=lambda p: (p[1], p[0]))
+
+
+def _run_files(directory):
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, n) for n in names if n.endswith(".parquet")]
+
+
+def _with_run_id_type(table):
+    """table with run_id as RUN_ID_TYPE; files written before it was widened hold int8 indices."""
+    i = table.schema.get_field_index("run_id")
+    if i < 0 or table.schema.field(i).type == RUN_ID_TYPE:
+        return table
+    return table.set_column(i, "run_id", table.column(i).cast(RUN_ID_TYPE))
+
+
+def _run_id(file_path):
+    """run_id of a daily file, from its run-<run_id>.parquet name."""
+    return os.path.basename(file_path)[len("run-"):-len(".parquet")]
+
+
+def _compacted_runs(metadata):
+    """run_ids merged into a month file, from its FileMetaData; None for a
+    month file written before they were listed (it holds every daily run)."""
+    listed = (metadata.metadata or {}).get(COMPACTED_RUNS_KEY)
+    return frozenset(json.loads(listed)) if listed is not None else None
+
+
+def _month_runs(month_file):
+    """run_ids a month file holds, read from its rows if they aren't listed."""
+    runs = _compacted_runs(pq.read_metadata(month_file))
+    if runs is None:
+        column = pq.read_table(month_file, columns=["run_id"])["run_id"]
+        runs = frozenset(pc.unique(column.cast(pa.string())).to_pylist())
+    return runs
+
+
+class _SortedRunReader:
+    """Reads a region-sorted file forward, one slice of regions at a time."""
+
+    def __init__(self, file_path):
+        self.file = pq.ParquetFile(file_path)
+        self.next_group = 0
+        self.buffer = None
+
+    def take_below(self, upper):
+        """Rows with region_id < upper (all remaining rows if upper is None)."""
+        parts = []
+        while True:
+            if self.buffer is None:
+                if self.next_group >= self.file.num_row_groups:
+                    break
+                self.buffer = self.file.read_row_group(self.next_group)
+                self.next_group += 1
+            n = self.buffer.num_rows if upper is None else pc.sum(
+                pc.less(self.buffer["region_id"], upper)).as_py() or 0
+            parts.append(self.buffer.slice(0, n))
+            if n < self.buffer.num_rows:
+                self.buffer = self.buffer.slice(n)
+                break
+            self.buffer = None
+        return parts
+
+
+def compact_history(path=None, before=None, row_group_size=DEFAULT_MONTH_ROW_GROUP_SIZE):
+    """Merges the daily run files of each month ending before `before` into one month file.
+
+    The inputs are already region-sorted, so this is a streaming k-way merge:
+    regions are taken in slices bounded by one input's row-group starts, and
+    memory holds one slice from every input at a time. Runs that arrive after
+    their month was compacted are merged in by rewriting the month file with
+    them. A new month file is published before any daily file is removed,
+    and only daily files whose runs it lists are removed, so a crash at any
+    point leaves no duplicate or missing runs.
+    """
+    path = path or history_path()
+    before = before or datetime.now(timezone.utc).date().replace(day=1)
+    months = {}
+    for kind, first, _, directory in _list_partitions(path):
+        if kind == DAY_PARTITION and first < before:
+            months.setdefault(first.strftime("%Y-%m"), []).append(directory)
+
+    for month, directories in sorted(months.items()):
+        month_dir = os.path.join(path, f"{MONTH_PARTITION}={month}")
+        month_file = os.path.join(month_dir, "part-0.parquet")
+        files = [f for d in directories for f in _run_files(d)]
+        has_month = os.path.exists(month_file)
+        compacted = _month_runs(month_file) if has_month else frozenset()
+        pending = [f for f in files if _run_id(f) not in compacted]
+        if pending:
+            os.makedirs(month_dir, exist_ok=True)
+            inputs = ([month_file] if has_month else []) + pending
+            readers = [_SortedRunReader(f) for f in inputs]
+            guide = max(readers, key=lambda r: r.file.metadata.num_rows).file.metadata
+            column = guide.schema.names.index("region_id")
+            bounds = [guide.row_group(i).column(column).statistics.min for i in range(1, guide.num_row_groups)]
+            runs = json.dumps(sorted(compacted | {_run_id(f) for f in pending})).encode()
+            tmp_path = month_file + ".tmp"
+            writer = None
+            for upper in bounds + [None]:
+                parts = [_with_run_id_type(part) for reader in readers for part in reader.take_below(upper)]
+                chunk = pa.concat_tables(parts, promote_options="permissive") if parts else None
+                if chunk is None or chunk.num_rows == 0:
+                    continue
+                chunk = chunk.take(pc.sort_indices(chunk, [("region_id", "ascending"), ("run_at", "ascending")]))
+                if writer is None:
+                    schema = chunk.schema.with_metadata({**(chunk.schema.metadata or {}), COMPACTED_RUNS_KEY: runs})
+                    writer = pq.ParquetWriter(tmp_path, schema, compression=COMPRESSION, write_statistics=True)
+                writer.write_table(chunk.cast(writer.schema), row_group_size=row_group_size)
+            if writer is not None:
+                writer.close()
+                os.replace(tmp_path, month_file)
+                record_bytes("written", month_file, "compact_history")
+                print(f"Compacted {len(pending)} runs of {month} into {month_file}")
+        if os.path.exists(month_file):
+            compacted = _month_runs(month_file)
+            for directory in directories:
+                for file_path in _run_files(directory):
+                    if _run_id(file_path) in compacted:
+                        os.remove(file_path)
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass  # still holds runs that aren't merged yet
+
+
+class HistoryStore:
+    """Reads one region's history over a date range.
+
+    Partitions outside the range are skipped by directory name without being
+    opened. History files change only when late runs are merged into a month
+    file, so footers are parsed once per file version and kept (for the
+    `footer_cache` most recently used files); a lookup
+    then only reads the row groups whose region_id min/max can hold the region.
+    """
+
+    def __init__(self, path=None, footer_cache=256, workers=8):
+        self.path = path or history_path()
+        self.footer_cache = footer_cache
+        self.workers = workers
+        self._footers = OrderedDict()  # file path -> (stat identity, FileMetaData, region_id mins, maxes)
+        self._lock = threading.Lock()
+
+    def _footer(self, file_path):
+        # Keyed on the file's identity too: a month file is rewritten when late runs are merged in
+        stat = os.stat(file_path)
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            footer = self._footers.get(file_path)
+            if footer is not None and footer[0] == identity:
+                self._footers.move_to_end(file_path)
+                return footer[1:]
+        metadata = pq.read_metadata(file_path)
+        column = metadata.schema.names.index("region_id")
+        stats = [metadata.row_group(i).column(column).statistics for i in range(metadata.num_row_groups)]
+        mins = np.array([s.min if s is not None and s.has_min_max else "" for s in stats], dtype=object)
+        maxes = np.array([s.max if s is not None and s.has_min_max else "\U0010ffff" for s in stats], dtype=object)
+        with self._lock:
+            self._footers[file_path] = (identity, metadata, mins, maxes)
+            self._footers.move_to_end(file_path)
+            while len(self._footers) > self.footer_cache:
+                self._footers.popitem(last=False)
+        return metadata, mins, maxes
+
+    def _files(self, start, end):
+        partitions = _list_partitions(self.path)
+        compacted = {}  # first day of a month -> run_ids its month file holds
+        for kind, first, _, directory in partitions:
+            if kind == MONTH_PARTITION:
+                try:
+                    compacted[first] = _compacted_runs(self._footer(os.path.join(directory, "part-0.parquet"))[0])
+                except FileNotFoundError:
+                    continue
+        for kind, first, last, directory in partitions:
+            if (start is not None and last < start) or (end is not None and first > end):
+                continue
+            for file_path in _run_files(directory):
+                if kind == DAY_PARTITION:
+                    listed = compacted.get(first.replace(day=1), frozenset())
+                    if listed is None or _run_id(file_path) in listed:
+                        continue  # merged into the month file, about to be removed
+                yield file_path
+
+    def _read(self, file_path, region_id):
+        try:
+            metadata, mins, maxes = self._footer(file_path)
+        except FileNotFoundError:
+            return None  # removed by a concurrent compaction; its runs are in the month file
+        groups = np.flatnonzero((mins <= region_id) & (maxes >= region_id)).tolist()
+        if not groups:
+            return None
+        table = pq.ParquetFile(file_path, metadata=metadata).read_row_groups(groups)
+        table = table.filter(pc.equal(table["region_id"], region_id))
+        return _with_run_id_type(table) if table.num_rows else None
+
+    def region(self, region_id, start=None, end=None):
+        """History rows for `region_id` with run dates in [start, end], oldest run first."""
+        files = list(self._files(start, end))
+        # Parquet decoding releases the GIL, so per-file reads overlap in threads
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(files)))) as pool:
+            tables = [t for t in pool.map(lambda f: self._read(f, region_id), files) if t is not None]
+        columns = HISTORY_COLUMNS + RUN_COLUMNS
+        if not tables:
+            return pd.DataFrame(columns=columns + [DAY_PARTITION])
+        df = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+        df[DAY_PARTITION] = df["run_at"].dt.date
+        if start is not None:
+            df = df[df[DAY_PARTITION] >= start]
+        if end is not None:
+            df = df[df[DAY_PARTITION] <= end]
+        return df.sort_values("run_at", kind="stable").reset_index(drop=True)[columns + [DAY_PARTITION]]
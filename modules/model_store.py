@@ -0,0 +1,126 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+
+try:
+    from modules.telemetry import record_bytes, record_cache
+except ImportError:  # executed as a script from modules/
+    from telemetry import record_bytes, record_cache
+
+MODEL_DIR = "data/models/isolation_forest"
+
+# Decile bins per feature, kept with the model for drift checks.
+PROFILE_BINS = 10
+
+
+class ModelNotFoundError(LookupError):
+    """There is no saved model (or none for the requested features) to score with."""
+
+
+def feature_profile(X):
+    """Per-feature bin edges (training deciles) and the share of rows in each bin."""
+    profile = {}
+    for col in X.columns:
+        values = X[col].to_numpy(dtype=np.float64)
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, PROFILE_BINS + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        profile[col] = {"edges": edges.tolist(), "shares": (counts / max(len(values), 1)).tolist()}
+    return profile
+
+
+def population_stability(profile, X):
+    """Largest Population Stability Index across features of X vs. the training profile.
+
+    PSI < 0.1 is usually read as no shift, 0.1-0.25 as moderate, > 0.25 as major.
+    """
+    worst = 0.0
+    for col, ref in profile.items():
+        edges = np.asarray(ref["edges"])
+        expected = np.clip(np.asarray(ref["shares"]), 1e-6, None)
+        counts = np.bincount(np.searchsorted(edges, X[col].to_numpy(dtype=np.float64), side="right"),
+                             minlength=len(edges) + 1)
+        actual = np.clip(counts / max(len(X), 1), 1e-6, None)
+        worst = max(worst, float(np.sum((actual - expected) * np.log(actual / expected))))
+    return worst
+
+
+class ModelStore:
+    """Versioned on-disk store for a fitted model plus its metadata.
+
+    Each save writes `<version>.joblib` (model + metadata) into `model_dir` and
+    then points `LATEST` at it, so readers never load a half-written model.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, keep=5):
+        self.model_dir = model_dir
+        self.keep = keep  # versions kept on disk after a save (None = all)
+        self._loaded = (None, None)  # (version, artifact) of the last load
+
+    def _path(self, version):
+        return os.path.join(self.model_dir, f"{version}.joblib")
+
+    def latest_version(self):
+        try:
+            with open(os.path.join(self.model_dir, "LATEST"), "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def save(self, model, metadata):
+        """Persists a new version and makes it the latest. Returns the version string."""
+        os.makedirs(self.model_dir, exist_ok=True)
+        trained_at = datetime.now(timezone.utc)
+        version = trained_at.strftime("%Y%m%dT%H%M%S%fZ")
+        metadata = dict(metadata, version=version, trained_at=trained_at.isoformat())
+        joblib.dump({"model": model, "metadata": metadata}, self._path(version))
+        record_bytes("written", self._path(version), "model_save")
+
+        tmp_path = os.path.join(self.model_dir, "LATEST.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.model_dir, "LATEST"))
+        with open(os.path.join(self.model_dir, f"{version}.json"), "w") as f:
+            json.dump({k: v for k, v in metadata.items() if k != "profile"}, f, indent=2)
+        if self.keep is not None:
+            self.prune(keep=self.keep)
+        return version
+
+    def versions(self):
+        """Saved versions, oldest first (version strings sort by training time)."""
+        try:
+            names = os.listdir(self.model_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(n[:-len(".joblib")] for n in names if n.endswith(".joblib"))
+
+    def prune(self, keep=5):
+        """Deletes all but the `keep` newest versions (never the latest one).
+
+        A process still holding an older version in memory keeps scoring with it;
+        only loading a pruned version by name fails.
+        """
+        latest = self.latest_version()
+        for version in self.versions()[:-max(int(keep), 1)]:
+            if version == latest:
+                continue
+            for path in (self._path(version), os.path.join(self.model_dir, f"{version}.json")):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def load(self, version=None):
+        """Returns (model, metadata) for `version` (default: latest), or (None, None)."""
+        version = version or self.latest_version()
+        if version is None or not os.path.exists(self._path(version)):
+            return None, None
+        loaded_version, artifact = self._loaded
+        record_cache("model", hit=loaded_version == version)
+        if loaded_version != version:
+            artifact = joblib.load(self._path(version))
+            record_bytes("read", self._path(version), "model_load")
+            self._loaded = (version, artifact)
+        return artifact["model"], artifact["metadata"]
@@ -0,0 +1,149 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    from modules.schema import map_columns, read_columns
+    from modules.storage import dataset_version
+    from modules.summary import records
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script from modules/
+    from schema import map_columns, read_columns
+    from storage import dataset_version
+    from summary import records
+    from telemetry import record_bytes
+
+MOVERS_FILE = "movers.json"
+# Scores compared run over run
+MOVER_METRICS = ['risk_score', 'inclusion_score', 'staleness_drift']
+DIRECTIONS = ("risers", "fallers")
+
+
+def load_previous(source):
+    """The previous run's region_id/state/metric columns from output directory `source`, or None.
+
+    Maps the Arrow IPC copy when there is one (no decode), else reads the parquet dataset.
+    """
+    columns = ['region_id', 'state'] + MOVER_METRICS
+    arrow_path = os.path.join(source, "anomaly_data.arrow")
+    data_path = os.path.join(source, "anomaly_data.parquet")
+    if os.path.exists(arrow_path):
+        return map_columns(arrow_path, columns)[0]
+    if os.path.exists(data_path):
+        return read_columns(data_path, columns)
+    return None
+
+
+def _sorted_merge(current_ids, previous_ids):
+    """For each current region, its row in the previous run (or -1), by a sorted-key merge.
+
+    Both runs' keys are sorted together once (in Arrow, without materialising
+    Python strings); region_ids must be unique within a run (ValueError if not),
+    so a region present in both runs ends up as two equal neighbours, one from
+    each side.
+    """
+    n = len(current_ids)
+    # A str column read from the partitioned dataset is chunked (one chunk per partition file)
+    keys = pa.chunked_array([pa.array(current_ids, type=pa.large_string()),
+                             pa.array(previous_ids, type=pa.large_string())]).combine_chunks()
+    order = pc.sort_indices(keys).to_numpy()
+    ordered = keys.take(order)
+    same = pc.equal(ordered.slice(0, len(ordered) - 1), ordered.slice(1)).to_numpy(zero_copy_only=False)
+    left, right = order[:-1][same], order[1:][same]
+    repeated = (left < n) == (right < n)  # equal neighbours from the same run
+    if repeated.any():
+        run = "current" if left[repeated][0] < n else "previous"
+        raise ValueError(f"region_id {ordered[int(np.flatnonzero(same)[repeated][0])]} is repeated in the {run} run")
+    matched = np.full(n, -1, dtype=np.int64)
+    matched[np.minimum(left, right)] = np.maximum(left, right) - n
+    return matched
+
+
+def _top_k(delta, groups, n_groups, k):
+    """Row positions of the k largest and k smallest non-zero deltas, overall and per group.
+
+    Returns {direction: [overall rows, group 0 rows, group 1 rows, ...]}. One
+    float sort per metric serves both directions; the per-group split is a
+    stable (radix) sort of the group codes, so ranks within a group keep the
+    delta order and the first k of each group are its top k.
+    """
+    rows = np.flatnonzero(~np.isnan(delta) & (delta != 0))
+    ascending = rows[np.argsort(delta[rows], kind="stable")]
+    result = {}
+    for direction, ordered in (("risers", ascending[::-1]), ("fallers", ascending)):
+        ordered = ordered[(delta[ordered] > 0) if direction == "risers" else (delta[ordered] < 0)]
+        by_group = ordered[np.argsort(groups[ordered], kind="stable")]
+        bounds = np.searchsorted(groups[by_group], np.arange(n_groups + 1))
+        result[direction] = [ordered[:k]] + [by_group[lo:min(lo + k, hi)] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    return result
+
+
+def build_movers(current, previous, top_k=50, data_version=None, previous_run=None):
+    """Run-over-run deltas of MOVER_METRICS and the top-K risers and fallers, globally and per state.
+
+    `current` and `previous` are the two runs' frames; regions missing from the
+    previous run have no delta and are only counted.
+    """
+    n = len(current)
+    if previous is not None:
+        matched = _sorted_merge(current['region_id'], previous['region_id'])
+    else:
+        matched = np.full(n, -1)
+    has_previous = matched >= 0
+
+    codes, states = pd.factorize(current['state'])
+    groups = np.where(codes < 0, len(states), codes)  # missing state: global lists only
+    n_groups = len(states) + 1
+
+    metrics = {}
+    for metric in MOVER_METRICS:
+        values = current[metric].to_numpy(dtype=np.float64)
+        before = np.full(n, np.nan)
+        # Runs written before a metric was carried through have no previous value for it
+        if previous is not None and metric in previous.columns:
+            before[has_previous] = previous[metric].to_numpy(dtype=np.float64)[matched[has_previous]]
+        delta = values - before
+
+        result = {"global": {}, "by_state": {str(s): {} for s in states}}
+        for direction, lists in _top_k(delta, groups, n_groups, top_k).items():
+            # One frame for every list of this direction, split back up afterwards
+            rows = np.concatenate(lists)
+            frame = current.iloc[rows][['region_id', 'state', 'district']]
+            frame = frame.assign(previous=before[rows], current=values[rows], delta=delta[rows])
+            ranked = records(frame)
+            offsets = np.cumsum([0] + [len(r) for r in lists])
+            result["global"][direction] = ranked[offsets[0]:offsets[1]]
+            for g, state in enumerate(states):
+                result["by_state"][str(state)][direction] = ranked[offsets[g + 1]:offsets[g + 2]]
+        metrics[metric] = result
+
+    return {
+        "data_version": list(data_version) if data_version is not None else None,
+        "previous_run": previous_run,
+        "top_k": top_k,
+        "compared_regions": int(has_previous.sum()),
+        "new_regions": int((~has_previous).sum()),
+        "removed_regions": int(len(previous) - has_previous.sum()) if previous is not None else 0,
+        "metrics": metrics,
+    }
+
+
+def write_movers(current, previous_source, data_path, output_path, top_k=50):
+    """Compares the frame just saved at `data_path` with the run published in
+    `previous_source` (None: no previous run) and writes the movers artifact."""
+    previous = load_previous(previous_source) if previous_source else None
+    previous_run = os.path.basename(os.path.normpath(previous_source)) if previous is not None else None
+    movers = build_movers(current, previous, top_k=top_k, data_version=dataset_version(data_path),
+                          previous_run=previous_run)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(movers, f)
+    os.replace(tmp_path, output_path)
+    record_bytes("written", output_path, "compute_movers")
+    print(f"Saved run-over-run movers to {output_path} "
+          f"({movers['compared_regions']} compared, {movers['new_regions']} new)")
+    return movers
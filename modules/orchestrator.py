@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+try:
+    from modules.data_pipeline import DataPipeline
+except ImportError:  # executed as a script: python modules/orchestrator.py
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from modules.data_pipeline import DataPipeline
+from modules.scoring_engine import ScoringEngine
+from modules.anomaly_detector import AnomalyDetector
+from modules.chart_aggregates import write_chart_aggregates
+from modules.config import get_section
+from modules.history import append_history, history_path as configured_history_path
+from modules.movers import write_movers
+from modules.rollup import write_rollup
+from modules.schema import SCORED_COLUMNS, select_columns
+from modules.snapshots import OUTPUT_ROOT, discard_snapshot, live_dir, publish_snapshot, stage_snapshot
+from modules.summary import write_summary_artifact
+from modules.telemetry import span
+
+
+class PipelineOrchestrator:
+    """Runs generate -> process -> score -> detect in one process.
+
+    The DataFrame is handed from stage to stage in memory; the processed and
+    scored intermediates are only written to disk when `persist_intermediate`
+    is set. With `stream`, processing instead runs out-of-core
+    (DataPipeline.process_streaming, in `pipeline.stream_batch_size` batches)
+    into processed_data.parquet, and scoring starts by loading that dataset.
+    Per-stage wall-clock timings are collected in `self.timings`; each stage
+    also runs inside a telemetry span (duration, RSS, rows processed).
+
+    Every run writes its outputs into its own staging directory under
+    `output_dir` and is published as an immutable snapshot (see
+    modules/snapshots.py) only once all stages succeed, so concurrent runs
+    never overwrite each other's outputs and readers never see a partial run.
+    Working files (scoring stats and the intermediates) stay in `output_dir`
+    itself, where ScoringEngine and the step-by-step CLIs read them.
+    """
+
+    def __init__(
+        self,
+        input_path="data/inputs/aadhaar_mock_data.parquet",
+        output_dir="data/outputs",
+        persist_intermediate=False,
+        stream=False,
+        anomaly_mode="auto",
+        model_dir=None,
+        history_path=None,
+    ):
+        self.input_path = input_path
+        self.output_dir = output_dir
+        self.persist_intermediate = persist_intermediate
+        self.stream = stream
+        self.anomaly_mode = anomaly_mode
+        self.model_dir = model_dir
+        # The configured history lives under the default output root; other roots (benchmarks) keep their own
+        self.history_path = history_path or (
+            configured_history_path() if output_dir == OUTPUT_ROOT else os.path.join(output_dir, "history.parquet"))
+        self.timings = {}
+        self.df = None
+        self.run_dir = output_dir
+
+    def _output(self, name):
+        """Path of a published output, inside this run's snapshot."""
+        return os.path.join(self.run_dir, name)
+
+    def _intermediate(self, name):
+        """Path of a working file (stats, intermediates), kept in `output_dir` where
+        the step-by-step CLIs and incremental rescoring look for it."""
+        return os.path.join(self.output_dir, name)
+
+    def _stage(self, name, fn, progress=None, rows=None):
+        """Runs one stage. Rows processed are taken from a returned DataFrame or row
+        count, or from `rows` (a callable) for stages that return something else."""
+        if progress is not None:
+            progress(name)
+        with span(name) as info:
+            start = time.perf_counter()
+            result = fn()
+            self.timings[name] = time.perf_counter() - start
+            if isinstance(result, pd.DataFrame):
+                info["rows"] = len(result)
+            elif rows:
+                info["rows"] = rows()
+            elif isinstance(result, int):
+                info["rows"] = result
+        return result
+
+    def run(self, generate=False, n_regions=None, progress=None):
+        """Runs the full pipeline and returns a dict with row count, the published
+        snapshot's name and stage timings.
+
+        `generate` regenerates the synthetic input (written to `input_path`) first. `progress`, if given, is
+        called with each stage name just before the stage starts.
+        """
+        self.timings = {}
+        run_start = time.perf_counter()
+        run_at = datetime.now(timezone.utc)
+
+        # The run this one is compared against for movers; resolved before anything is published
+        previous_dir = live_dir(self.output_dir)
+        snapshot, self.run_dir = stage_snapshot(self.output_dir)
+        try:
+            self._run_stages(generate, n_regions, progress, previous_dir)
+        except Exception:
+            discard_snapshot(self.run_dir)
+            raise
+        keep = get_section("pipeline").get("keep_snapshots", 3)
+        self.run_dir = self._stage(
+            "publish", lambda: publish_snapshot(snapshot, self.run_dir, self.output_dir, keep=keep), progress)
+        # Scores and flags of every run are kept, keyed by the snapshot that published them
+        self._stage("record_history",
+                    lambda: append_history(self.df, run_id=snapshot, run_at=run_at, path=self.history_path),
+                    progress, rows=lambda: len(self.df))
+
+        total = time.perf_counter() - run_start
+        print("Pipeline timings: " + ", ".join(f"{k}={v:.3f}s" for k, v in self.timings.items())
+              + f" (total {total:.3f}s)")
+        return {
+            "rows": len(self.df),
+            "snapshot": snapshot,
+            "timings": dict(self.timings),
+            "total_seconds": total,
+        }
+
+    def _run_stages(self, generate, n_regions, progress, previous_dir=None):
+        if self.stream:
+            engine = self._process_streaming(generate, n_regions, progress)
+        else:
+            engine = ScoringEngine()
+            engine.df = self._process(generate, n_regions, progress)
+        self._stage("calculate_scores", engine.calculate_scores, progress)
+        # Only the scored schema travels on; the raw counts are no longer needed
+        engine.df = select_columns(engine.df, SCORED_COLUMNS)
+        # Normalisation stats let later runs rescore changed regions incrementally
+        engine.save_stats(self._intermediate("scoring_stats.json"))
+        if self.persist_intermediate:
+            self._stage("save_scored",
+                        lambda: engine.save_scored_data(self._intermediate("scored_data.parquet")), progress,
+                        rows=lambda: len(engine.df))
+
+        detector = AnomalyDetector(mode=self.anomaly_mode, model_dir=self.model_dir)
+        detector.df = engine.df
+        self._stage("detect_anomalies", detector.detect_anomalies, progress)
+        data_path = self._output("anomaly_data.parquet")
+        self._stage("save", lambda: detector.save_anomalies(data_path, arrow_path=self._output("anomaly_data.arrow")),
+                    progress, rows=lambda: len(detector.df))
+        top_k = get_section("pipeline").get("top_k_anomalies", 100)
+        self._stage("summarize", lambda: write_summary_artifact(
+            detector.df, data_path, self._output("summary.json"), top_k=top_k), progress,
+            rows=lambda: len(detector.df))
+        dashboard = get_section("dashboard")
+        self._stage("aggregate_charts", lambda: write_chart_aggregates(
+            detector.df, data_path, self._output("charts.json"),
+            bins=dashboard.get("density_bins", 80), max_points=dashboard.get("max_overlay_points", 2000)),
+            progress, rows=lambda: len(detector.df))
+        self._stage("build_rollup", lambda: write_rollup(detector.df, data_path, self._output("rollup.json")),
+                    progress, rows=lambda: len(detector.df))
+        self._stage("compute_movers", lambda: write_movers(
+            detector.df, previous_dir, data_path, self._output("movers.json"),
+            top_k=get_section("pipeline").get("top_k_movers", 50)), progress, rows=lambda: len(detector.df))
+
+        self.df = detector.df
+
+    def _process(self, generate, n_regions, progress):
+        """Load (or generate) -> preprocess -> feature_engineering in memory; returns the processed frame."""
+        pipeline = DataPipeline(input_path=self.input_path)
+        if generate:
+            from scripts.mock_data_gen import generate_aadhaar_data, N_REGIONS
+            pipeline.df = self._stage(
+                "generate", lambda: generate_aadhaar_data(n_regions or N_REGIONS, output_path=self.input_path), progress
+            )
+        else:
+            self._stage("load", pipeline.load_data, progress)
+
+        self._stage("preprocess", pipeline.preprocess, progress)
+        self._stage("feature_engineering", pipeline.feature_engineering, progress)
+        if self.persist_intermediate:
+            self._stage("save_processed",
+                        lambda: pipeline.save_processed(self._intermediate("processed_data.parquet")), progress,
+                        rows=lambda: len(pipeline.df))
+        return pipeline.df
+
+    def _process_streaming(self, generate, n_regions, progress):
+        """Generates the input to disk if asked, processes it out-of-core into
+        processed_data.parquet and returns a ScoringEngine loaded from it."""
+        processed_path = self._intermediate("processed_data.parquet")
+        if generate:
+            from scripts.mock_data_gen import generate_to_parquet, N_REGIONS
+            self._stage("generate", lambda: generate_to_parquet(n_regions or N_REGIONS, self.input_path), progress)
+        pipeline = DataPipeline(input_path=self.input_path)
+        batch_size = get_section("pipeline").get("stream_batch_size", 100_000)
+        self._stage("process_streaming", lambda: pipeline.process_streaming(processed_path, batch_size=batch_size),
+                    progress)
+        engine = ScoringEngine(input_path=processed_path)
+        self._stage("load_processed", engine.load_data, progress)
+        return engine
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the full A.I.R.R. pipeline in one process.")
+    parser.add_argument("--generate", action="store_true", help="Regenerate synthetic input data first")
+    parser.add_argument("--persist-intermediate", action="store_true",
+                        help="Also write processed_data.parquet and scored_data.parquet")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process the input out-of-core in pipeline.stream_batch_size batches")
+    args = parser.parse_args()
+
+    PipelineOrchestrator(persist_intermediate=args.persist_intermediate, stream=args.stream).run(
+        generate=args.generate)
@@ -0,0 +1,140 @@
+import json
+import os
+
+import numpy as np
+
+
+def rank_error(k):
+    """Normalized rank error of a KLL sketch with parameter k (99% confidence).
+
+    Empirical fit from Apache DataSketches for single quantile queries:
+    k=200 -> ~1.3%, k=400 -> ~0.67%. A quantile(q) answer is the exact
+    quantile of some rank in [q - eps, q + eps].
+    """
+    return 2.296 / k ** 0.9723
+
+
+class KLLSketch:
+    """Mergeable approximate-quantile sketch (KLL: Karnin, Lang, Liberty 2016).
+
+    Level h holds sorted samples that each stand for 2^h input values. When a
+    level outgrows its capacity it is sorted and every other item (random
+    offset) is promoted to the level above, halving it; an odd count leaves
+    its smallest or largest item (at random) behind. Memory is O(k log(n/k))
+    no matter how many values are added, and sketches built over separate
+    chunks or partitions can be merged into one.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            buf = self.levels[level]
+            if len(buf) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                buf = np.sort(buf)
+                keep = buf[:0]
+                if len(buf) % 2:
+                    # The odd item stays behind: the smallest or the largest at random, so
+                    # compaction doesn't keep under-weighting one end of the level
+                    if self._rng.integers(2):
+                        keep, buf = buf[:1], buf[1:]
+                    else:
+                        keep, buf = buf[-1:], buf[:-1]
+                promoted = buf[self._rng.integers(2)::2]
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                self.levels[level] = keep
+            level += 1
+
+    def update(self, values):
+        """Adds an array of values (NaNs are ignored, like pandas' quantile)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Folds another sketch (same k) into this one."""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with k={self.k} and k={other.k}")
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile, within rank_error(k) of the exact one."""
+        if self.n == 0:
+            return float("nan")
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items_h), 2.0 ** h) for h, items_h in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        idx = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+        return float(items[order][min(idx, len(items) - 1)])
+
+    @property
+    def rank_error(self):
+        return rank_error(self.k)
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "n": self.n,
+            "min": self.min,
+            "max": self.max,
+            "levels": [items.tolist() for items in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, data, seed=0):
+        sketch = cls(k=data["k"], seed=seed)
+        sketch.n = data["n"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data["levels"]]
+        return sketch
+
+
+def save_sketches(sketches, path):
+    """Writes a {name: KLLSketch} mapping as JSON (atomically)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({name: sketch.to_dict() for name, sketch in sketches.items()}, f)
+    os.replace(tmp_path, path)
+
+
+def load_sketches(path):
+    """Inverse of save_sketches; returns None if the file doesn't exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return {name: KLLSketch.from_dict(data) for name, data in json.load(f).items()}
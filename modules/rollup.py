@@ -0,0 +1,165 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    from modules.storage import dataset_version
+    from modules.summary import HIGH_RISK_THRESHOLD
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script from modules/
+    from storage import dataset_version
+    from summary import HIGH_RISK_THRESHOLD
+    from telemetry import record_bytes
+
+ROLLUP_FILE = "rollup.json"
+# Rollup levels, outermost first; each level's nodes are children of the level above
+LEVELS = ['state', 'district', 'sub_district']
+# Separates the names in a node key, e.g. "Bihar/Patna/Taluk_7"; the root is ""
+KEY_SEPARATOR = "/"
+# Written in place of a separator (and of the escape character) inside a name, so every path has its own key
+KEY_ESCAPES = (("%", "%25"), (KEY_SEPARATOR, "%2F"))
+SUM_COLUMNS = ['population', 'aadhaar_generated', 'rejected_requests']
+# Averaged with population weights
+WEIGHTED_COLUMNS = ['inclusion_score', 'risk_score']
+QUANTILE_COLUMNS = ['inclusion_score', 'risk_score']
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def _escape_name(name):
+    for char, escaped in KEY_ESCAPES:
+        name = name.replace(char, escaped)
+    return name
+
+
+def node_key(*names):
+    """Key of the node for a (state, district, ...) path; a "/" in a name is escaped as "%2F"."""
+    return KEY_SEPARATOR.join(_escape_name(str(n)) for n in names)
+
+
+def _group_quantiles(groups, n_groups, values, quantiles):
+    """(n_groups, len(quantiles)) exact quantiles (linear interpolation) of `values` per group.
+
+    One sort by (group, value); each group is then a contiguous run, so every
+    quantile is read at a computed offset instead of per group. NaN is skipped.
+    """
+    valid = ~np.isnan(values)
+    groups, values = groups[valid], values[valid]
+    order = np.lexsort((values, groups))
+    ordered = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    has = counts > 0
+    for j, q in enumerate(quantiles):
+        at = (counts[has] - 1) * q
+        lo = np.floor(at).astype(np.int64)
+        hi = np.minimum(lo + 1, counts[has] - 1)
+        frac = at - lo
+        base = starts[has]
+        result[has, j] = ordered[base + lo] * (1 - frac) + ordered[base + hi] * frac
+    return result
+
+
+def _aggregate(df, groups, n_groups):
+    """Node statistics (without key/name/level) for every group of `groups`."""
+    regions = np.bincount(groups, minlength=n_groups)
+    population = df['population'].to_numpy(dtype=np.float64)
+    sums = {col: np.bincount(groups, weights=df[col].to_numpy(dtype=np.float64), minlength=n_groups)
+            for col in SUM_COLUMNS}
+    weighted = {}
+    for col in WEIGHTED_COLUMNS:
+        values = df[col].to_numpy(dtype=np.float64)
+        known = ~np.isnan(values)
+        num = np.bincount(groups[known], weights=values[known] * population[known], minlength=n_groups)
+        den = np.bincount(groups[known], weights=population[known], minlength=n_groups)
+        weighted[col] = np.divide(num, den, out=np.full(n_groups, np.nan), where=den > 0)
+    anomalies = np.bincount(groups, weights=df['is_anomaly'].to_numpy(dtype=np.float64), minlength=n_groups)
+    high_risk = np.bincount(groups, weights=(df['risk_score'].to_numpy(dtype=np.float64) > HIGH_RISK_THRESHOLD),
+                            minlength=n_groups)
+    quantiles = {col: _group_quantiles(groups, n_groups, df[col].to_numpy(dtype=np.float64), QUANTILES)
+                 for col in QUANTILE_COLUMNS}
+    return [{
+        "regions": int(regions[g]),
+        **{f"total_{col}": int(sums[col][g]) for col in SUM_COLUMNS},
+        **{f"weighted_avg_{col}": _float(weighted[col][g]) for col in WEIGHTED_COLUMNS},
+        "anomalies": int(anomalies[g]),
+        "high_risk_regions": int(high_risk[g]),
+        **{f"{col}_quantiles": {f"p{round(q * 100)}": _float(v) for q, v in zip(QUANTILES, quantiles[col][g])}
+           for col in QUANTILE_COLUMNS},
+    } for g in range(n_groups)]
+
+
+def _level_nodes(df, level_codes, names, depth):
+    """Nodes at `depth` (0 = state), one per non-empty path; returns (nodes, parent keys)."""
+    # Combine the path's categorical codes into one integer per row (missing names get code 0)
+    combined = np.zeros(len(df), dtype=np.int64)
+    for codes, cats in zip(level_codes[:depth + 1], names[:depth + 1]):
+        combined = combined * (len(cats) + 1) + (codes + 1)
+    unique, groups = np.unique(combined, return_inverse=True)
+    # Decode each group's path back into per-level names
+    paths = np.empty((len(unique), depth + 1), dtype=np.int64)
+    rest = unique.copy()
+    for d in range(depth, -1, -1):
+        base = len(names[d]) + 1
+        paths[:, d] = rest % base - 1
+        rest //= base
+
+    nodes, parents = [], []
+    for path, stats in zip(paths, _aggregate(df, groups.ravel(), len(unique))):
+        path = [str(names[d][code]) if code >= 0 else "" for d, code in enumerate(path)]
+        nodes.append({"key": node_key(*path), "name": path[-1], "level": LEVELS[depth], **stats})
+        parents.append(node_key(*path[:-1]))
+    return nodes, parents
+
+
+def _float(value):
+    return None if np.isnan(value) else float(value)
+
+
+def build_rollup(df, data_version=None):
+    """Precomputes the state -> district -> sub_district rollup cube.
+
+    Every node (plus the "" root for all regions) holds region and anomaly
+    counts, population-weighted average inclusion/risk scores, sums of the raw
+    counts and score quantiles. Nodes are stored by key and each parent's
+    children are listed per level, so serving any node or its children is a
+    dict lookup rather than a groupby.
+    """
+    level_codes, names = [], []
+    for level in LEVELS:
+        codes, cats = pd.factorize(df[level], sort=True)
+        level_codes.append(codes)
+        names.append(cats)
+
+    root = _aggregate(df, np.zeros(len(df), dtype=np.int64), 1)[0]
+    nodes = {"": {"key": "", "name": None, "level": None, **root}}
+    children = {}
+    for depth, level in enumerate(LEVELS):
+        level_nodes, parents = _level_nodes(df, level_codes, names, depth)
+        children[level] = {}
+        for node, parent in zip(level_nodes, parents):
+            nodes[node["key"]] = node
+            children[level].setdefault(parent, []).append(node["key"])
+
+    return {
+        "data_version": list(data_version) if data_version is not None else None,
+        "levels": LEVELS,
+        "key_separator": KEY_SEPARATOR,
+        "quantiles": list(QUANTILES),
+        "nodes": nodes,
+        "children": children,
+    }
+
+
+def write_rollup(df, data_path, output_path):
+    """Builds the rollup cube for the frame just saved at `data_path` and writes it as JSON."""
+    rollup = build_rollup(df, data_version=dataset_version(data_path))
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(rollup, f)
+    os.replace(tmp_path, output_path)
+    record_bytes("written", output_path, "build_rollup")
+    print(f"Saved rollup cube ({len(rollup['nodes'])} nodes) to {output_path}")
+    return rollup
@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+try:
+    from modules.storage import map_arrow_file, open_dataset
+except ImportError:  # executed as a script from modules/
+    from storage import map_arrow_file, open_dataset
+
+# Column sets each stage reads and writes. Reads are projected to these
+# columns; outputs are written in exactly this order.
+ID_COLUMNS = ['region_id', 'state', 'district', 'sub_district']
+
+UPDATE_TYPE_COLS = ['mobile_updates', 'address_updates', 'dob_updates', 'biometric_updates']
+
+# Raw input columns the processing stage uses; anything else in the input is skipped
+PIPELINE_INPUT_COLUMNS = ID_COLUMNS + [
+    'population', 'aadhaar_generated', 'update_requests_total', 'rejected_requests',
+    'avg_processing_time_days', 'operator_count', 'staleness_drift',
+] + UPDATE_TYPE_COLS
+
+FEATURE_COLUMNS = [
+    'update_type_entropy', 'correction_ratio', 'repeat_update_ratio', 'saturation', 'updates_per_operator',
+]
+
+PROCESSED_COLUMNS = PIPELINE_INPUT_COLUMNS + FEATURE_COLUMNS
+
+SCORED_COLUMNS = ID_COLUMNS + [
+    'inclusion_score', 'risk_score',
+    'saturation', 'avg_processing_time_days', 'correction_ratio',
+    'update_type_entropy', 'repeat_update_ratio', 'updates_per_operator',
+    'population', 'aadhaar_generated',
+    'rejected_requests',  # Isolation Forest feature
+    'staleness_drift',  # Compared run over run (modules/movers.py)
+]
+
+ANOMALY_COLUMNS = SCORED_COLUMNS + [
+    'anomaly_score_if', 'anomaly_score', 'is_anomaly_if', 'is_anomaly_rule_bot', 'is_anomaly', 'anomaly_reason',
+]
+# Only present when anomaly.partition_by is set
+PARTITION_ANOMALY_COLUMNS = ['anomaly_score_partition', 'is_anomaly_partition']
+
+# Low-cardinality strings, held as pandas categoricals / parquet dictionaries
+CATEGORY_COLUMNS = ['state', 'district', 'sub_district', 'anomaly_reason']
+
+# Target narrow dtypes for raw counts. compact_dtypes only applies an integer
+# target when every value of the column fits (and skips columns with NaNs), so
+# the resulting dtype can differ between frames, e.g. between batches of a
+# streamed run. Derived features and scores stay float64: score normalisation
+# and rule thresholds compare them exactly.
+COMPACT_DTYPES = {
+    'population': 'int32',
+    'aadhaar_generated': 'int32',
+    'update_requests_total': 'int32',
+    'rejected_requests': 'int32',
+    'mobile_updates': 'int32',
+    'address_updates': 'int32',
+    'dob_updates': 'int32',
+    'biometric_updates': 'int32',
+    'operator_count': 'int16',
+    'avg_processing_time_days': 'float32',
+    'anomaly_score_if': 'int8',
+}
+
+
+def compact_dtypes(df):
+    """Converts category columns to categoricals and narrows numeric columns, in place.
+
+    Integer columns are only narrowed when every value fits; columns holding
+    NaNs are left alone until preprocessing has filled them. Idempotent.
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col, dtype in COMPACT_DTYPES.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        series = df[col]
+        if np.issubdtype(np.dtype(dtype), np.integer):
+            if not pd.api.types.is_integer_dtype(series.dtype) or len(series) == 0:
+                continue
+            info = np.iinfo(dtype)
+            if series.min() < info.min or series.max() > info.max:
+                continue
+        elif not pd.api.types.is_float_dtype(series.dtype):
+            continue
+        df[col] = series.astype(dtype)
+    return df
+
+
+def read_columns(path, columns, filter=None):
+    """Reads only `columns` (those present) from a parquet file or partitioned dataset.
+
+    String category columns are decoded straight into categoricals rather
+    than materialised as one string per row first. `filter` (a pyarrow
+    expression, e.g. `storage.risk_filter(...)`) prunes partitions and row
+    groups before anything is decoded.
+    """
+    dataset = open_dataset(path, dictionary_columns=CATEGORY_COLUMNS)
+    columns = [c for c in columns if c in dataset.schema.names]
+    table = dataset.to_table(columns=columns, filter=filter)
+    for i, field in enumerate(table.schema):
+        # e.g. the partition column, which the dataset yields as strings
+        if field.name in CATEGORY_COLUMNS and not pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+    return compact_dtypes(table.to_pandas())
+
+
+def _column_view(column):
+    """pandas data viewing an Arrow array's buffers where the layout allows it.
+
+    Numeric columns without nulls and dictionary codes are wrapped as-is, and
+    strings stay Arrow-backed; booleans (bit-packed in Arrow) and anything
+    holding nulls are converted.
+    """
+    column = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+    if column.null_count == 0:
+        if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            return column.to_numpy(zero_copy_only=True)
+        if pa.types.is_dictionary(column.type):
+            return pd.Categorical.from_codes(
+                column.indices.to_numpy(zero_copy_only=True),
+                categories=column.dictionary.to_pandas(), validate=False,
+            )
+    return column.to_pandas()
+
+
+def map_columns(path, columns):
+    """Memory-maps `columns` (those present) of an Arrow IPC file written by
+    `storage.write_arrow_file`; returns (DataFrame, data_version).
+
+    The frame's numeric and categorical columns are read-only views into the
+    mapping, so processes mapping the same file share one page-cache copy.
+    """
+    table, data_version = map_arrow_file(path)
+    columns = [c for c in columns if c in table.schema.names]
+    df = pd.DataFrame({name: _column_view(table.column(name)) for name in columns}, copy=False)
+    return df, data_version
+
+
+def select_columns(df, columns, optional=()):
+    """Projects df onto an output schema: every column in `columns` (KeyError if
+    one is missing) followed by whichever `optional` columns df has."""
+    return df[list(columns) + [c for c in optional if c in df.columns]]
@@ -1,24 +1,63 @@
+import json
+import os
+
 import pandas as pd
 import numpy as np
 
+try:
+    from modules.schema import SCORED_COLUMNS, compact_dtypes, read_columns, select_columns
+    from modules.storage import RISK_SORT, write_dataset
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script: python modules/scoring_engine.py
+    from schema import SCORED_COLUMNS, compact_dtypes, read_columns, select_columns
+    from storage import RISK_SORT, write_dataset
+    from telemetry import record_bytes
+
+STATS_PATH = "data/outputs/scoring_stats.json"
+
+# Score components: (column, invert). Normalisation min/max are tracked per column.
+SCORE_COMPONENTS = [
+    ('saturation', False),
+    ('avg_processing_time_days', True),
+    ('correction_ratio', True),
+    ('update_type_entropy', True),
+    ('repeat_update_ratio', False),
+    ('updates_per_operator', False),
+]
+
 class ScoringEngine:
     def __init__(self, input_path="data/outputs/processed_data.parquet"):
         self.input_path = input_path
         self.df = None
+        self.stats = None  # {column: {"min": ..., "max": ...}} used by the last scoring run
 
     def load_data(self):
+        """Loads the identity, feature and (if present) score columns, with compact dtypes."""
         try:
-            self.df = pd.read_parquet(self.input_path)
+            self.df = read_columns(self.input_path, SCORED_COLUMNS)
+            record_bytes("read", self.input_path, "load_processed", columns=SCORED_COLUMNS)
             print(f"Scoring Engine: Loaded data with shape: {self.df.shape}")
             return self.df
         except Exception as e:
             print(f"Scoring Engine Error loading data: {e}")
             raise
 
-    def _normalize(self, series, invert=False):
-        """Normalizes a series to 0-1 range. If invert is True, 1 is best/lowest."""
-        min_val = series.min()
-        max_val = series.max()
+    @staticmethod
+    def _component_stats(df):
+        """Global min/max of every score component column."""
+        return {
+            col: {"min": float(df[col].min()), "max": float(df[col].max())}
+            for col, _ in SCORE_COMPONENTS
+        }
+
+    def _normalize(self, series, invert=False, stats=None):
+        """Normalizes a series to 0-1 range. If invert is True, 1 is best/lowest.
+
+        `stats` ({"min", "max"}) overrides the series' own min/max, so a subset
+        of rows can be normalised exactly as it would be in the full table.
+        """
+        min_val = series.min() if stats is None else stats["min"]
+        max_val = series.max() if stats is None else stats["max"]
         if max_val == min_val:
             return pd.Series(1.0 if invert else 0.0, index=series.index)
         
@@ -31,19 +70,27 @@ class ScoringEngine:
         if self.df is None:
             raise ValueError("Data not loaded")
 
+        self.stats = self._component_stats(self.df)
+        self._score_rows(self.df, self.stats)
+
+        print("Scoring completed.")
+        return self.df
+
+    def _score_rows(self, df, stats):
+        """Writes inclusion_score/risk_score into df, normalising with the given global stats."""
         # --- Inclusion Score (High is Good) ---
         # Components:
         # 1. Saturation (Higher is better)
         # 2. Avg Processing Time (Lower is better)
         # 3. Rejection/Correction Ratio (Lower is better - indicates smooth process)
         
-        norm_saturation = self._normalize(self.df['saturation'], invert=False)
-        norm_processing = self._normalize(self.df['avg_processing_time_days'], invert=True)
-        norm_correction = self._normalize(self.df['correction_ratio'], invert=True)
+        norm_saturation = self._normalize(df['saturation'], invert=False, stats=stats['saturation'])
+        norm_processing = self._normalize(df['avg_processing_time_days'], invert=True, stats=stats['avg_processing_time_days'])
+        norm_correction = self._normalize(df['correction_ratio'], invert=True, stats=stats['correction_ratio'])
         
         # Weighted Sum for Inclusion
         # Weights: Saturation (40%), Processing Speed (30%), Quality/Ease (30%)
-        self.df['inclusion_score'] = (
+        df['inclusion_score'] = (
             (norm_saturation * 0.4) + 
             (norm_processing * 0.3) + 
             (norm_correction * 0.3)
@@ -59,38 +106,116 @@ class ScoringEngine:
         # 2. Repeat Update Ratio (Higher is riskier)
         # 3. Updates per Operator (Higher is riskier - overloading/gaming)
         
-        norm_entropy_risk = self._normalize(self.df['update_type_entropy'], invert=True) # Low entropy = High Risk
-        norm_repeat_risk = self._normalize(self.df['repeat_update_ratio'], invert=False) # High repeat = High Risk
-        norm_load_risk = self._normalize(self.df['updates_per_operator'], invert=False) # High load = High Risk
+        norm_entropy_risk = self._normalize(df['update_type_entropy'], invert=True, stats=stats['update_type_entropy']) # Low entropy = High Risk
+        norm_repeat_risk = self._normalize(df['repeat_update_ratio'], invert=False, stats=stats['repeat_update_ratio']) # High repeat = High Risk
+        norm_load_risk = self._normalize(df['updates_per_operator'], invert=False, stats=stats['updates_per_operator']) # High load = High Risk
         
         # Weighted Sum for Risk
         # Weights: Entropy (40% - catching specific update dumps), Repeat (30%), Load (30%)
-        self.df['risk_score'] = (
+        df['risk_score'] = (
             (norm_entropy_risk * 0.4) + 
             (norm_repeat_risk * 0.3) + 
             (norm_load_risk * 0.3)
         ) * 100
+        return df
 
-        print("Scoring completed.")
+    def rescore_incremental(self, delta, stats=None):
+        """Applies a delta of changed/new processed regions to the scored self.df.
+
+        Only the delta rows are rescored, using the persisted normalisation stats,
+        as long as the delta leaves every component's global min/max where it
+        was. If it could move one (a new value outside the range, or a replaced
+        row that held an extreme), the whole table is rescored instead. Either
+        way the result is identical to a full `calculate_scores()`.
+        """
+        if self.df is None:
+            raise ValueError("Data not loaded")
+        stats = stats or self.stats or self.load_stats()
+        if stats is None:
+            raise ValueError("No normalisation stats; run calculate_scores() first")
+
+        positions = pd.Index(self.df['region_id']).get_indexer(delta['region_id'])
+        existing = positions >= 0
+        replaced = self.df.iloc[positions[existing]]
+
+        moves_range = False
+        for col, _ in SCORE_COMPONENTS:
+            lo, hi = stats[col]["min"], stats[col]["max"]
+            if delta[col].min() < lo or delta[col].max() > hi:
+                moves_range = True
+            elif (replaced[col] == lo).any() or (replaced[col] == hi).any():
+                moves_range = True
+
+        delta = delta.reset_index(drop=True)
+        if not moves_range:
+            self._score_rows(delta, stats)
+        self._apply_delta(delta, positions, existing)
+
+        if moves_range:
+            print("Scoring: delta moves a global min/max, rescoring all regions.")
+            return self.calculate_scores()
+
+        self.stats = stats
+        print(f"Scoring: incrementally rescored {len(delta)} regions "
+              f"({int(existing.sum())} updated, {int((~existing).sum())} new).")
         return self.df
 
+    def _apply_delta(self, delta, positions, existing):
+        """Overwrites matched rows in place and appends unmatched ones."""
+        rows = positions[existing]
+        for col in delta.columns:
+            if col in self.df.columns:
+                if isinstance(self.df[col].dtype, pd.CategoricalDtype):
+                    # e.g. a region moved to a district not seen before
+                    new = pd.Index(delta.loc[existing, col].dropna().unique()).difference(self.df[col].cat.categories)
+                    if len(new):
+                        self.df[col] = self.df[col].cat.add_categories(new)
+                self.df.iloc[rows, self.df.columns.get_loc(col)] = delta.loc[existing, col].to_numpy()
+        if (~existing).any():
+            self.df = pd.concat([self.df, delta.loc[~existing]], ignore_index=True)
+            compact_dtypes(self.df)  # concat of categoricals with different categories gives strings
+
+    def save_stats(self, output_path=STATS_PATH):
+        """Persists the normalisation stats used for the current scores."""
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        # Replaced atomically: concurrent runs write the same file
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.stats, f)
+        os.replace(tmp_path, output_path)
+        record_bytes("written", output_path, "save_stats")
+        print(f"Saved scoring stats to {output_path}")
+
+    def load_stats(self, path=STATS_PATH):
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            self.stats = json.load(f)
+        return self.stats
+
     def save_scored_data(self, output_path="data/outputs/scored_data.parquet"):
-        import os
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        cols_to_keep = [
-            'region_id', 'state', 'district', 'sub_district', 
-            'inclusion_score', 'risk_score',
-            'saturation', 'avg_processing_time_days', 'correction_ratio',
-            'update_type_entropy', 'repeat_update_ratio', 'updates_per_operator',
-            'population', 'aadhaar_generated'
-        ]
-        # Keep all relevant columns plus scores, maybe drop intermediate raw counts if needed, 
-        # but for prototype keep robust set.
-        self.df.to_parquet(output_path, index=False)
+        # Identity, scores and the features downstream stages use; raw counts are dropped.
+        # Partitioned by state and sorted by risk within each partition.
+        write_dataset(select_columns(self.df, SCORED_COLUMNS), output_path, sort_by=RISK_SORT)
+        record_bytes("written", output_path, "save_scored")
         print(f"Saved scored data to {output_path}")
 
 if __name__ == "__main__":
-    engine = ScoringEngine()
-    engine.load_data()
-    engine.calculate_scores()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compute inclusion and risk scores.")
+    parser.add_argument("--delta", help="Processed parquet of changed regions to rescore incrementally "
+                                        "against the existing scored_data.parquet")
+    args = parser.parse_args()
+
+    if args.delta:
+        engine = ScoringEngine(input_path="data/outputs/scored_data.parquet")
+        engine.load_data()
+        engine.rescore_incremental(read_columns(args.delta, SCORED_COLUMNS))
+    else:
+        engine = ScoringEngine()
+        engine.load_data()
+        engine.calculate_scores()
     engine.save_scored_data()
+    engine.save_stats()
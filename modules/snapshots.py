@@ -0,0 +1,96 @@
+import os
+import shutil
+import time
+import uuid
+
+# Each pipeline run writes its outputs into a fresh directory under
+# <root>/snapshots/ and then goes live by replacing the <root>/CURRENT pointer
+# file, so readers only ever see a complete run. Published snapshots are never
+# modified; the oldest are pruned once `keep` newer ones exist.
+OUTPUT_ROOT = "data/outputs"
+SNAPSHOTS_DIR = "snapshots"
+POINTER_FILE = "CURRENT"
+STAGING_SUFFIX = ".staging"
+
+
+def _snapshots(root):
+    return os.path.join(root, SNAPSHOTS_DIR)
+
+
+def current_snapshot(root=OUTPUT_ROOT):
+    """Name of the live snapshot, or None if nothing has been published."""
+    try:
+        with open(os.path.join(root, POINTER_FILE), "r") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return name or None
+
+
+def live_dir(root=OUTPUT_ROOT):
+    """Directory holding the live outputs.
+
+    Resolve this once and read every file of a version from the result: the
+    pointer may move between two reads. Falls back to `root` itself for
+    outputs written before snapshots existed.
+    """
+    name = current_snapshot(root)
+    if name is not None:
+        path = os.path.join(_snapshots(root), name)
+        if os.path.isdir(path):
+            return path
+    return root
+
+
+def live_path(name, root=OUTPUT_ROOT):
+    """Path of output file `name` in the live snapshot."""
+    return os.path.join(live_dir(root), name)
+
+
+def stage_snapshot(root=OUTPUT_ROOT):
+    """Creates an empty staging directory for a new snapshot; returns (name, path).
+
+    Names sort by creation time, and the random suffix keeps concurrent runs
+    (e.g. from different API workers) apart.
+    """
+    name = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + uuid.uuid4().hex[:8]
+    path = os.path.join(_snapshots(root), "." + name + STAGING_SUFFIX)
+    os.makedirs(path)
+    return name, path
+
+
+def publish_snapshot(name, staging_path, root=OUTPUT_ROOT, keep=3):
+    """Makes a finished staging directory the live snapshot; returns its path."""
+    path = os.path.join(_snapshots(root), name)
+    os.rename(staging_path, path)
+    pointer = os.path.join(root, POINTER_FILE)
+    tmp_pointer = f"{pointer}.{name}.tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)  # the atomic swap
+    prune_snapshots(root, keep=keep)
+    print(f"Published snapshot {name}")
+    return path
+
+
+def discard_snapshot(staging_path):
+    """Removes the staging directory of a failed run."""
+    shutil.rmtree(staging_path, ignore_errors=True)
+
+
+def prune_snapshots(root=OUTPUT_ROOT, keep=3):
+    """Deletes all but the `keep` newest published snapshots (never the live one).
+
+    Older versions stay around briefly so readers that resolved them just
+    before a swap can finish; memory-mapped files survive deletion anyway.
+    """
+    snapshots_dir = _snapshots(root)
+    if not os.path.isdir(snapshots_dir):
+        return
+    live = current_snapshot(root)
+    names = sorted(n for n in os.listdir(snapshots_dir) if not n.startswith("."))
+    for name in names[:-max(int(keep), 1)]:
+        if name != live:
+            shutil.rmtree(os.path.join(snapshots_dir, name), ignore_errors=True)
@@ -0,0 +1,216 @@
+import json
+import os
+import shutil
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    from modules.config import get_section
+except ImportError:  # executed as a script from modules/
+    from config import get_section
+
+# Outputs are hive-partitioned datasets: <path>/state=<value>/part-0.parquet,
+# plus a _metadata file holding every row group's statistics.
+PARTITION_COLUMN = "state"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"  # pyarrow's hive default for missing values
+COMPRESSION = "zstd"
+DEFAULT_ROW_GROUP_SIZE = 65_536
+# Sort key within each partition; sorted row groups have narrow min/max stats,
+# so risk filters skip most of them.
+RISK_SORT = ["risk_score", "region_id"]
+# Schema metadata key in the Arrow IPC copy naming the parquet dataset version it mirrors
+ARROW_VERSION_KEY = b"airr.data_version"
+
+
+def dataset_version(path):
+    """(mtime_ns, size) identifying what is currently published at `path`.
+
+    For a dataset directory this is its _metadata file, which is written last.
+    Raises FileNotFoundError if nothing is published.
+    """
+    target = os.path.join(path, "_metadata") if os.path.isdir(path) else path
+    st = os.stat(target)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _partition_dir(value):
+    if pd.isna(value):
+        return f"{PARTITION_COLUMN}={NULL_PARTITION}"
+    return f"{PARTITION_COLUMN}={quote(str(value), safe='')}"
+
+
+def dataset_order(df, sort_by=None):
+    """df in the row order a read of `write_dataset(df, path, sort_by)` returns it:
+    partitions in directory-name order (as listed in _metadata), each sorted by `sort_by`."""
+    codes, values = pd.factorize(df[PARTITION_COLUMN])
+    dirs = [_partition_dir(v) for v in values] + [_partition_dir(None)]
+    rank = np.argsort(np.argsort(dirs, kind="stable"))
+    partition = rank[codes]  # code -1 (missing) picks the trailing null partition
+    ordered = df.assign(_partition=partition).sort_values(["_partition"] + list(sort_by or []), kind="stable")
+    return ordered.drop(columns="_partition")
+
+
+def _publish(tmp_path, path):
+    """Moves a finished dataset into place, replacing a previous dataset or single file."""
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.isdir(path):
+        os.rename(path, old_path)
+    elif os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+
+class DatasetWriter:
+    """Appends DataFrames to a hive-partitioned parquet dataset.
+
+    Each partition value gets one file; rows are buffered per partition and
+    flushed as row groups of `row_group_size` rows, zstd-compressed with
+    column statistics. Everything is written under `<path>.tmp` and moved to
+    `path` by `close()`, so readers never see a half-written dataset.
+    """
+
+    def __init__(self, path, row_group_size=None):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.row_group_size = row_group_size or get_section("pipeline").get("row_group_size", DEFAULT_ROW_GROUP_SIZE)
+        self.schema = None
+        self._writers = {}  # partition dir -> ParquetWriter
+        self._pending = {}  # partition dir -> [tables], not yet flushed
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+    def write(self, df, sort_by=None):
+        """Adds df's rows. `sort_by` sorts each partition's slice of df before it is buffered."""
+        for value, group in df.groupby(PARTITION_COLUMN, observed=True, sort=False, dropna=False):
+            if sort_by:
+                group = group.sort_values(sort_by, kind="stable")
+            group = group.drop(columns=PARTITION_COLUMN)
+            # Pin every slice to the first one's schema (e.g. an all-null column)
+            table = pa.Table.from_pandas(group, schema=self.schema, preserve_index=False)
+            if self.schema is None:
+                self.schema = table.schema
+            key = _partition_dir(value)
+            self._pending.setdefault(key, []).append(table)
+            if sum(t.num_rows for t in self._pending[key]) >= self.row_group_size:
+                self._flush(key, final=False)
+        if self.schema is None and len(df.columns):
+            self.schema = pa.Schema.from_pandas(df.iloc[:0].drop(columns=PARTITION_COLUMN), preserve_index=False)
+
+    def _flush(self, key, final=True):
+        """Writes the buffered rows of one partition; unless `final`, a remainder
+        smaller than a row group stays buffered for the next write."""
+        table = pa.concat_tables(self._pending.pop(key))
+        if not final:
+            n_full = table.num_rows - table.num_rows % self.row_group_size
+            if n_full < table.num_rows:
+                self._pending[key] = [table.slice(n_full)]
+            table = table.slice(0, n_full)
+        writer = self._writers.get(key)
+        if writer is None:
+            os.makedirs(os.path.join(self.tmp_path, key), exist_ok=True)
+            writer = self._writers[key] = pq.ParquetWriter(
+                os.path.join(self.tmp_path, key, "part-0.parquet"), self.schema,
+                compression=COMPRESSION, write_statistics=True,
+            )
+        writer.write_table(table, row_group_size=self.row_group_size)
+
+    def close(self):
+        """Flushes remaining rows, writes _common_metadata/_metadata and publishes the dataset."""
+        for key in list(self._pending):
+            self._flush(key)
+        collector = []
+        for key, writer in sorted(self._writers.items()):
+            writer.close()
+            metadata = pq.read_metadata(os.path.join(self.tmp_path, key, "part-0.parquet"))
+            metadata.set_file_path(f"{key}/part-0.parquet")
+            collector.append(metadata)
+        self._writers = {}
+        schema = self.schema or pa.schema([])
+        pq.write_metadata(schema, os.path.join(self.tmp_path, "_common_metadata"))
+        pq.write_metadata(schema, os.path.join(self.tmp_path, "_metadata"), metadata_collector=collector)
+        _publish(self.tmp_path, self.path)
+
+    def abort(self):
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def write_dataset(df, path, sort_by=None, row_group_size=None):
+    """Writes df as a hive-partitioned dataset at `path` (replacing what was there)."""
+    writer = DatasetWriter(path, row_group_size=row_group_size)
+    try:
+        writer.write(df, sort_by=sort_by)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+
+
+def open_dataset(path, dictionary_columns=()):
+    """pyarrow Dataset over a partitioned dataset directory or a single parquet file.
+
+    Directories are planned from their _metadata file when present, so row-group
+    statistics are available without opening every file footer.
+    """
+    file_format = ds.ParquetFileFormat(read_options={"dictionary_columns": list(dictionary_columns)})
+    if not os.path.isdir(path):
+        return ds.dataset(path, format=file_format)
+    # Partition values come back as plain strings: pyarrow can't yet unify
+    # dictionaries that hold the null partition, so callers encode them.
+    partitioning = ds.HivePartitioning.discover()
+    metadata_path = os.path.join(path, "_metadata")
+    if os.path.exists(metadata_path):
+        return ds.parquet_dataset(metadata_path, format=file_format, partitioning=partitioning)
+    return ds.dataset(path, format=file_format, partitioning=partitioning)
+
+
+def risk_filter(state=None, min_risk=None):
+    """Filter expression for the usual region filters.
+
+    The state test prunes whole partitions; the risk test is pushed down to
+    row-group statistics, which the per-partition risk sort keeps selective.
+    """
+    expression = None
+    if state is not None:
+        expression = ds.field(PARTITION_COLUMN) == state
+    if min_risk:
+        risk = ds.field("risk_score") >= min_risk
+        expression = risk if expression is None else expression & risk
+    return expression
+
+
+def write_arrow_file(df, path, data_version=None):
+    """Publishes df as an uncompressed Arrow IPC (Feather v2) file for memory-mapping.
+
+    Written as a single record batch with no compression, so a reader can map
+    the file and use every buffer in place. `data_version` (the dataset_version
+    of the parquet dataset df was saved to) goes in the schema metadata. The
+    file is renamed over the previous one, never rewritten in place: processes
+    still mapping the old version keep reading its unlinked inode.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    if data_version is not None:
+        metadata = dict(table.schema.metadata or {})
+        metadata[ARROW_VERSION_KEY] = json.dumps(list(data_version)).encode()
+        table = table.replace_schema_metadata(metadata)
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def map_arrow_file(path):
+    """Memory-maps an Arrow IPC file: returns (table, data_version or None) without reading it."""
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    raw = (table.schema.metadata or {}).get(ARROW_VERSION_KEY)
+    return table, tuple(json.loads(raw)) if raw else None
@@ -0,0 +1,63 @@
+import json
+import os
+
+try:
+    from modules.storage import dataset_version
+    from modules.telemetry import record_bytes
+except ImportError:  # executed as a script from modules/
+    from storage import dataset_version
+    from telemetry import record_bytes
+
+HIGH_RISK_THRESHOLD = 80
+SUMMARY_PATH = "data/outputs/summary.json"
+
+
+def summarize(df):
+    """Headline stats served by /api/summary, for one frame (global or one state)."""
+    return {
+        "total_regions": len(df),
+        "total_population_covered": int(df['population'].sum()),
+        "aadhaar_generated_total": int(df['aadhaar_generated'].sum()),
+        "avg_inclusion_score": float(df['inclusion_score'].mean()),
+        "avg_risk_score": float(df['risk_score'].mean()),
+        "total_anomalies": int(df['is_anomaly'].sum()),
+        "high_risk_regions": int((df['risk_score'] > HIGH_RISK_THRESHOLD).sum()),
+    }
+
+
+def records(df):
+    """Rows of df as dicts of native Python scalars, NaN -> None, so they serialise as strict JSON."""
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+
+def build_summary_artifact(df, top_k=100, data_version=None):
+    """Precomputes global + per-state summaries and top-K anomalies (by risk_score).
+
+    `data_version` is the `storage.dataset_version` of the dataset `df` was
+    written to, so readers can tell whether the artifact matches the data they hold.
+    """
+    anomalies = df[df['is_anomaly']].sort_values(by='risk_score', ascending=False, kind="stable")
+    return {
+        "data_version": list(data_version) if data_version is not None else None,
+        "top_k": top_k,
+        "global": summarize(df),
+        "by_state": {state: summarize(group) for state, group in df.groupby('state', sort=True, observed=True)},
+        "top_anomalies": records(anomalies.head(top_k)),
+        "top_anomalies_by_state": {
+            state: records(group.head(top_k))
+            for state, group in anomalies.groupby('state', sort=True, observed=True)
+        },
+    }
+
+
+def write_summary_artifact(df, data_path, output_path=SUMMARY_PATH, top_k=100):
+    """Builds the artifact for the frame just saved at `data_path` and writes it as JSON."""
+    artifact = build_summary_artifact(df, top_k=top_k, data_version=dataset_version(data_path))
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(artifact, f)
+    os.replace(tmp_path, output_path)
+    record_bytes("written", output_path, "summarize")
+    print(f"Saved summary artifact to {output_path}")
+    return artifact
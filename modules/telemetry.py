@@ -0,0 +1,202 @@
+import os
+import resource
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Latency buckets (seconds) shared by stage and HTTP histograms
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape_label_value(value):
+    # Prometheus text format: backslash, double quote and newline are escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs) + "}"
+
+
+class Registry:
+    """Minimal thread-safe metrics registry rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._types = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+
+    def _declare(self, name, kind, help_text):
+        self._types.setdefault(name, kind)
+        if help_text:
+            self._help.setdefault(name, help_text)
+
+    def inc(self, name, value=1, help_text=None, **labels):
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            key = (name, _label_key(labels))
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, help_text=None, **labels):
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, help_text=None, buckets=DEFAULT_BUCKETS, **labels):
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            key = (name, _label_key(labels))
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                                "sum": 0.0, "count": 0}
+            for i, bound in enumerate(hist["buckets"]):
+                if value <= bound:
+                    hist["counts"][i] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            lines = []
+            for name in sorted(self._types):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types[name]}")
+                for (metric, key), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+                for (metric, key), value in sorted(self._gauges.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+                for (metric, key), hist in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(hist["buckets"], hist["counts"]):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', repr(float(bound)))])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {hist['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist['count']}")
+            return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# The last few finished spans, for ad-hoc inspection without a profiler
+RECENT_SPANS = deque(maxlen=500)
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No procfs (e.g. macOS): fall back to the high-water mark
+        scale = 1 if sys.platform == "darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def start_span(stage):
+    """Starts timing `stage`; pass the returned dict to finish_span.
+
+    For spans that can't wrap a `with` block, e.g. an HTTP request whose body
+    is streamed after the handler returns. `stage` may be changed on the dict
+    before it is finished (e.g. once the request is routed).
+    """
+    return {"stage": stage, "rows": None, "_rss_before": rss_bytes(), "_start": time.perf_counter()}
+
+
+def finish_span(info, status="ok"):
+    """Records a span from start_span: duration, RSS and row count under its stage."""
+    duration = time.perf_counter() - info.pop("_start")
+    rss_before = info.pop("_rss_before")
+    rss_after = rss_bytes()
+    stage = info["stage"]
+    info.update(seconds=duration, rss_bytes=rss_after, rss_delta_bytes=rss_after - rss_before,
+                status=status, finished_at=time.time())
+    RECENT_SPANS.append(info)
+    REGISTRY.observe("airr_stage_duration_seconds", duration, "Pipeline stage wall time",
+                     stage=stage, status=status)
+    REGISTRY.set("airr_stage_rss_bytes", rss_after, "Process RSS when the stage last finished", stage=stage)
+    REGISTRY.set("airr_stage_rss_delta_bytes", rss_after - rss_before,
+                 "RSS growth over the stage's last run", stage=stage)
+    if info["rows"] is not None:
+        REGISTRY.inc("airr_stage_rows_total", int(info["rows"]), "Rows processed per stage", stage=stage)
+
+
+@contextmanager
+def span(stage):
+    """Times a pipeline stage and records its memory use.
+
+    Yields a dict; set `rows` on it to count rows processed by the stage.
+    """
+    info = start_span(stage)
+    status = "error"
+    try:
+        yield info
+        status = "ok"
+    finally:
+        finish_span(info, status)
+
+
+def _parquet_bytes(path, columns):
+    """Compressed size of `columns`' chunks in every row group of a parquet file or dataset."""
+    if os.path.isdir(path):
+        metadata_path = os.path.join(path, "_metadata")
+        if os.path.exists(metadata_path):
+            footers = [pq.read_metadata(metadata_path)]
+        else:
+            footers = [pq.read_metadata(os.path.join(root, name))
+                       for root, _, names in os.walk(path) for name in names if name.endswith(".parquet")]
+    else:
+        footers = [pq.read_metadata(path)]
+    wanted = set(columns)
+    size = 0
+    for metadata in footers:
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            for j in range(row_group.num_columns):
+                chunk = row_group.column(j)
+                if chunk.path_in_schema.split(".")[0] in wanted:
+                    size += chunk.total_compressed_size
+    return size
+
+
+def record_bytes(direction, path, stage, columns=None):
+    """Counts the bytes a stage just read ("read") or wrote ("written") at a file or dataset directory.
+
+    With `columns` (a projected parquet read) only those columns' chunks are
+    counted, not the whole file.
+    """
+    try:
+        if columns is not None:
+            size = _parquet_bytes(path, columns)
+        elif os.path.isdir(path):
+            size = sum(os.path.getsize(os.path.join(root, name))
+                       for root, _, names in os.walk(path) for name in names)
+        else:
+            size = os.path.getsize(path)
+    except (OSError, pa.ArrowException):
+        return
+    REGISTRY.inc(f"airr_bytes_{direction}_total", size, f"Bytes {direction} by pipeline stages", stage=stage)
+
+
+def record_cache(cache, hit):
+    REGISTRY.inc("airr_cache_requests_total", 1, "Cache lookups by result", cache=cache,
+                 result="hit" if hit else "miss")
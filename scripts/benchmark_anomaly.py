@@ -0,0 +1,85 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.anomaly_detector import AnomalyDetector, FEATURES
+from modules.data_pipeline import DataPipeline
+from scripts.mock_data_gen import _iter_blocks
+
+
+def make_features(n_rows, seed=42):
+    """Synthetic regions run through preprocess + feature engineering, detector features only."""
+    parts = []
+    for table in _iter_blocks(n_rows, seed, 1_000_000, workers=None):
+        chunk = table.to_pandas()
+        DataPipeline._clean(chunk)
+        DataPipeline._add_features(chunk)
+        parts.append(chunk[FEATURES])
+    return pd.concat(parts, ignore_index=True)
+
+
+def measure(fn):
+    """Runs fn twice: once for wall time, once under tracemalloc for peak allocation (MB)."""
+    start = time.perf_counter()
+    result = fn()
+    secs = time.perf_counter() - start
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, secs, peak / 2**20
+
+
+def legacy_path(df):
+    """The original detect_anomalies path: copy X, fit_predict on all rows, one core."""
+    model = IsolationForest(n_estimators=100, contamination=0.05, random_state=42)
+    X = df[FEATURES].fillna(0)
+    _, fit_secs, fit_mb = measure(lambda: model.fit(X))
+    _, score_secs, score_mb = measure(lambda: model.predict(X))
+    return fit_secs, fit_mb, score_secs, score_mb
+
+
+def scalable_path(df, fit_sample_size, n_jobs, batch_size, model_dir):
+    """Subsampled, multicore training and chunked batch scoring via AnomalyDetector."""
+    detector = AnomalyDetector(mode="fit", model_dir=model_dir)
+    detector.settings.update(fit_sample_size=fit_sample_size, n_jobs=n_jobs, score_batch_size=batch_size)
+    detector.df = df
+    model, fit_secs, fit_mb = measure(lambda: detector._fit_model(detector._training_matrix(), "benchmark"))
+    _, score_secs, score_mb = measure(lambda: detector.decision_scores(model, df))
+    return fit_secs, fit_mb, score_secs, score_mb
+
+
+def run_benchmark(sizes, fit_sample_size, n_jobs, batch_size):
+    header = f"{'rows':>12} {'path':<10} {'fit (s)':>9} {'fit rows/s':>12} {'fit MB':>8} " \
+             f"{'score (s)':>10} {'score rows/s':>13} {'score MB':>9}"
+    print(header)
+    with tempfile.TemporaryDirectory() as model_dir:
+        for n_rows in sizes:
+            df = make_features(n_rows)
+            for name, run in (
+                ("current", lambda: legacy_path(df)),
+                ("scalable", lambda: scalable_path(df, fit_sample_size, n_jobs, batch_size, model_dir)),
+            ):
+                fit_secs, fit_mb, score_secs, score_mb = run()
+                print(f"{n_rows:>12,} {name:<10} {fit_secs:>9.2f} {n_rows / fit_secs:>12,.0f} {fit_mb:>8.0f} "
+                      f"{score_secs:>10.2f} {n_rows / score_secs:>13,.0f} {score_mb:>9.0f}")
+            del df
+    print("MB = peak traced allocation during the step (tracemalloc), excluding the input frame.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Isolation Forest training and scoring.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--fit-sample-size", type=int, default=250_000)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.fit_sample_size, args.n_jobs, args.batch_size)
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.data_pipeline import DataPipeline, UPDATE_TYPE_COLS
+
+
+def make_counts(n_rows, seed=42):
+    """Random update-count matrix shaped like the mock data, with some all-zero rows."""
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(0, 5000, size=(n_rows, len(UPDATE_TYPE_COLS)), dtype=np.int64)
+    counts[rng.random(n_rows) < 0.01] = 0
+    return counts
+
+
+def time_rowwise(counts):
+    """Times the legacy df.apply(_calculate_entropy) path. Returns (seconds, result)."""
+    pipeline = DataPipeline()
+    df = pd.DataFrame(counts, columns=UPDATE_TYPE_COLS)
+    start = time.perf_counter()
+    result = df.apply(pipeline._calculate_entropy, axis=1).to_numpy(dtype=np.float64)
+    return time.perf_counter() - start, result
+
+
+def time_columnar(counts):
+    """Times the vectorized _entropy_matrix path. Returns (seconds, result)."""
+    start = time.perf_counter()
+    result = DataPipeline._entropy_matrix(counts)
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(sizes, baseline_sample):
+    print(f"{'rows':>12} {'row-wise (s)':>14} {'columnar (s)':>14} {'speedup':>10}")
+    for n_rows in sizes:
+        counts = make_counts(n_rows)
+        col_secs, col_result = time_columnar(counts)
+
+        # The row-wise path is linear in rows but far too slow to run at 10M,
+        # so it is timed on a prefix and extrapolated.
+        sample = min(n_rows, baseline_sample)
+        row_secs, row_result = time_rowwise(counts[:sample])
+        max_err = np.abs(row_result - col_result[:sample]).max()
+        if not np.allclose(row_result, col_result[:sample], rtol=0, atol=1e-12):
+            raise AssertionError(f"Columnar entropy diverges from row-wise path (max err {max_err})")
+        row_secs = row_secs * n_rows / sample
+
+        marker = "*" if sample < n_rows else " "
+        print(f"{n_rows:>12,} {row_secs:>13.2f}{marker} {col_secs:>14.3f} {row_secs / col_secs:>9.0f}x")
+    print(f"* extrapolated from a {baseline_sample:,}-row sample (max abs diff vs row-wise < 1e-12)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark update_type_entropy: row-wise apply vs columnar.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--baseline-sample", type=int, default=200_000,
+                        help="Max rows to run through the slow row-wise path")
+    args = parser.parse_args()
+    run_benchmark(args.sizes, args.baseline_sample)
@@ -0,0 +1,63 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.data_pipeline import DataPipeline
+from modules.schema import PIPELINE_INPUT_COLUMNS, SCORED_COLUMNS, read_columns, select_columns
+from modules.scoring_engine import ScoringEngine
+from scripts.mock_data_gen import generate_to_parquet
+
+
+def legacy_frames(path):
+    """The original path: every column, default dtypes, nothing dropped."""
+    df = pd.read_parquet(path)
+    yield "load", df
+    df.fillna(0, inplace=True)
+    numerical_cols = df.select_dtypes(include=[np.number]).columns
+    df[numerical_cols] = df[numerical_cols].clip(lower=0)
+    DataPipeline._add_features(df)
+    yield "processed", df
+    engine = ScoringEngine()
+    engine.df = df
+    engine.calculate_scores()
+    yield "scored", engine.df
+
+
+def compact_frames(path):
+    """Projected reads, categoricals and narrow dtypes, scored schema handed on."""
+    df = read_columns(path, PIPELINE_INPUT_COLUMNS)
+    yield "load", df
+    DataPipeline._clean(df)
+    DataPipeline._add_features(df)
+    yield "processed", df
+    engine = ScoringEngine()
+    engine.df = df
+    engine.calculate_scores()
+    yield "scored", select_columns(engine.df, SCORED_COLUMNS)
+
+
+def footprint(frames, n_rows):
+    """MB per million rows of each stage's frame (pandas deep memory usage)."""
+    return {stage: df.memory_usage(deep=True).sum() / n_rows * 1_000_000 / 2**20 for stage, df in frames}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare per-stage frame memory before/after compact dtypes.")
+    parser.add_argument("--n-regions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    path = os.path.join("data", "bench", "inputs", f"regions_{args.n_regions}_seed{args.seed}.parquet")
+    if not os.path.exists(path):
+        generate_to_parquet(args.n_regions, path, seed=args.seed)
+
+    before = footprint(legacy_frames(path), args.n_regions)
+    after = footprint(compact_frames(path), args.n_regions)
+    print(f"pandas {pd.__version__}, {args.n_regions:,} regions")
+    print(f"{'stage':<12} {'before MB/1M':>13} {'after MB/1M':>12} {'saved':>7}")
+    for stage in before:
+        print(f"{stage:<12} {before[stage]:>13.1f} {after[stage]:>12.1f} {1 - after[stage] / before[stage]:>7.0%}")
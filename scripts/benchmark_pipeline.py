@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_DIR = "data/bench"
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000, 10_000_000]
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+def dataset_path(n_regions, seed):
+    return os.path.join(BENCH_DIR, "inputs", f"regions_{n_regions}_seed{seed}.parquet")
+
+
+def ensure_dataset(n_regions, seed):
+    """Generates the synthetic input for this size once and reuses it afterwards."""
+    from scripts.mock_data_gen import generate_to_parquet
+
+    path = dataset_path(n_regions, seed)
+    if not os.path.exists(path):
+        generate_to_parquet(n_regions, path, seed=seed)
+    return path
+
+
+def run_size(n_regions, seed):
+    """Runs the whole pipeline once on one dataset size. Executed in a fresh process
+    so peak RSS covers this size only."""
+    from modules.orchestrator import PipelineOrchestrator
+
+    input_path = ensure_dataset(n_regions, seed)
+    out_dir = os.path.join(BENCH_DIR, "outputs", str(n_regions))
+    orchestrator = PipelineOrchestrator(
+        input_path=input_path,
+        output_dir=out_dir,
+        anomaly_mode="fit",  # always pay the training cost, like a fresh deployment
+        model_dir=os.path.join(out_dir, "model"),
+    )
+
+    # Peak RSS is monotonic, so the value seen when stage i+1 starts is the
+    # high-water mark reached by the end of stage i.
+    boundaries = []
+    result = orchestrator.run(progress=lambda stage: boundaries.append((stage, _peak_rss_mb())))
+    boundaries.append((None, _peak_rss_mb()))
+
+    stages = {}
+    for (stage, _), (_, rss_after) in zip(boundaries, boundaries[1:]):
+        stages[stage] = {
+            "seconds": round(result["timings"][stage], 6),
+            "peak_rss_mb": round(rss_after, 1),
+        }
+    return {
+        "rows": result["rows"],
+        "total_seconds": round(result["total_seconds"], 6),
+        "peak_rss_mb": round(boundaries[-1][1], 1),
+        "stages": stages,
+    }
+
+
+def run_benchmark(sizes, seed):
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "seed": seed,
+        "sizes": {},
+    }
+    for n_regions in sizes:
+        print(f"--- {n_regions:,} regions ---")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            report["sizes"][str(n_regions)] = pool.submit(run_size, n_regions, seed).result()
+    return report
+
+
+def compare(report, baseline, tolerance, min_seconds):
+    """Prints current vs. baseline per size/stage; returns the list of regressions."""
+    regressions = []
+    print(f"\n{'size':>12} {'stage':<20} {'baseline':>10} {'current':>10} {'change':>8}")
+    for size, current in report["sizes"].items():
+        base = baseline.get("sizes", {}).get(size)
+        if base is None:
+            continue
+        rows = [(name, base["stages"][name]["seconds"], stage["seconds"], "s")
+                for name, stage in current["stages"].items() if name in base["stages"]]
+        rows.append(("total", base["total_seconds"], current["total_seconds"], "s"))
+        rows.append(("peak_rss_mb", base["peak_rss_mb"], current["peak_rss_mb"], "MB"))
+        for name, before, after, unit in rows:
+            change = (after - before) / before if before else 0.0
+            # Tiny stages are all noise; only flag time regressions above min_seconds.
+            noisy = unit == "s" and after - before < min_seconds
+            flag = change > tolerance and not noisy
+            if flag:
+                regressions.append((size, name, before, after))
+            print(f"{int(size):>12,} {name:<20} {before:>10.3f} {after:>10.3f} {change:>+7.0%}{' <-- REGRESSION' if flag else ''}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time every pipeline stage across dataset sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=os.path.join(BENCH_DIR, "results.json"),
+                        help="Where to write the machine-readable report")
+    parser.add_argument("--baseline", help="Report JSON to compare against; exits 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed slowdown / memory growth vs. baseline (0.2 = 20%%)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="Ignore time regressions smaller than this many seconds")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.seed)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark report to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance, args.min_seconds)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs. {args.baseline}")
+            sys.exit(1)
+        print(f"\nNo regressions vs. {args.baseline}")
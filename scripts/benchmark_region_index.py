@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.region_index import RegionIndex
+
+STATES = ["Maharashtra", "Uttar Pradesh", "Karnataka", "Tamil Nadu", "Bihar", "West Bengal", "Rajasthan"]
+
+
+def make_regions(n_rows, seed=42):
+    """Just the columns /api/regions filters on, shaped like the scored output."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "region_id": np.char.add("R", np.arange(n_rows).astype(str)),
+        "state": rng.choice(STATES, n_rows),
+        "risk_score": rng.beta(2, 5, n_rows) * 100,
+        "is_anomaly": rng.random(n_rows) < 0.05,
+    })
+
+
+def scan_query(df, state=None, min_risk=0.0, is_anomaly=None, offset=0, limit=100):
+    """The pre-index get_regions path: boolean masks, then iloc."""
+    if state:
+        df = df[df['state'] == state]
+    if min_risk > 0:
+        df = df[df['risk_score'] >= min_risk]
+    if is_anomaly is not None:
+        df = df[df['is_anomaly'] == is_anomaly]
+    return len(df), df.iloc[offset:offset + limit]
+
+
+def best_of(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+QUERIES = [
+    ("no filter", {}),
+    ("state", {"state": "Bihar"}),
+    ("anomaly", {"is_anomaly": True}),
+    ("min_risk=60", {"min_risk": 60.0}),
+    ("state+anomaly", {"state": "Bihar", "is_anomaly": True}),
+    ("state+min_risk=40", {"state": "Bihar", "min_risk": 40.0}),
+    ("all three", {"state": "Bihar", "min_risk": 40.0, "is_anomaly": True}),
+    ("state, deep page", {"state": "Bihar", "offset": 1_000_000}),
+]
+
+
+def run_benchmark(n_rows, repeats):
+    print(f"Building {n_rows:,} synthetic regions...")
+    df = make_regions(n_rows)
+    start = time.perf_counter()
+    index = RegionIndex(df)
+    print(f"Index build: {time.perf_counter() - start:.2f}s (once per data version)\n")
+
+    print(f"{'query':<20} {'scan (ms)':>12} {'index (ms)':>12} {'speedup':>10}")
+    for name, params in QUERIES:
+        expected_total, expected_page = scan_query(df, **params)
+        total, positions = index.query(**params)
+        if total != expected_total or not np.array_equal(positions, expected_page.index.to_numpy()):
+            raise AssertionError(f"Index result differs from scan for {name}")
+
+        scan_secs = best_of(lambda: scan_query(df, **params)[1].to_dict(orient="records"), repeats)
+        index_secs = best_of(lambda: df.iloc[index.query(**params)[1]].to_dict(orient="records"), repeats)
+        print(f"{name:<20} {scan_secs * 1e3:>12.2f} {index_secs * 1e3:>12.3f} {scan_secs / index_secs:>9.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /api/regions filtering: mask scan vs RegionIndex.")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.repeats)
@@ -1,9 +1,12 @@
 import pandas as pd
 import numpy as np
-import random
-from datetime import datetime, timedelta
 import os
 import yaml
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # Load config to get synthetic size if available, else default
 try:
@@ -13,105 +16,175 @@ try:
 except Exception:
     N_REGIONS = 1000
 
-def generate_aadhaar_data(n_regions=1000):
-    np.random.seed(42)
-    random.seed(42)
-
-    states = ["Maharashtra", "Uttar Pradesh", "Karnataka", "Tamil Nadu", "Bihar", "West Bengal", "Rajasthan"]
-    
-    real_districts = {
-        "Maharashtra": ["Mumbai", "Pune", "Nagpur", "Thane", "Nashik", "Aurangabad", "Solapur"],
-        "Uttar Pradesh": ["Lucknow", "Kanpur", "Varanasi", "Agra", "Meerut", "Ghaziabad", "Noida"],
-        "Karnataka": ["Bengaluru", "Mysuru", "Hubballi", "Mangaluru", "Belagavi", "Kalaburagi"],
-        "Tamil Nadu": ["Chennai", "Coimbatore", "Madurai", "Tiruchirappalli", "Salem", "Tirunelveli"],
-        "Bihar": ["Patna", "Gaya", "Bhagalpur", "Muzaffarpur", "Purnia", "Darbhanga"],
-        "West Bengal": ["Kolkata", "Howrah", "Durgapur", "Asansol", "Siliguri", "Bardhaman"],
-        "Rajasthan": ["Jaipur", "Jodhpur", "Kota", "Bikaner", "Ajmer", "Udaipur"]
-    }
-    
-    data = []
-    
-    for i in range(n_regions):
-        state = np.random.choice(states)
-        # Pick a real district if available, else generic
-        if state in real_districts:
-            district_name = np.random.choice(real_districts[state])
-            # Append a random number to handle duplicates in specific sub-regions logic if needed, 
-            # but for 1000 regions and limited districts, we will have repeats. 
-            # Let's make it look unique like "Pune South", "Pune North" or just keep district name and varied sub-districts.
-            # To avoid identical rows for same district, we rely on sub_district
-            district = district_name
-        else:
-            district = f"District_{random.randint(1, 30)}"
-            
-        sub_district = f"Taluk_{random.randint(1, 100)}"
-        region_id = f"R{i:05d}"
-        
-        # Base demographics
-        population = int(np.random.lognormal(10, 1)) # Random population size
-        if population < 1000: population = 1000
-        
-        aadhaar_generated = int(population * np.random.uniform(0.7, 0.99))
-        missing_aadhaar = population - aadhaar_generated
-        
-        # Staleness (days since last update for average record)
-        # Bimodal distribution: some regions very stale
-        if random.random() < 0.2:
-            avg_staleness = np.random.uniform(800, 1500) # High staleness
-        else:
-            avg_staleness = np.random.uniform(100, 600)  # Normal staleness
-            
-        # Service Quality Metrics
-        update_requests = int(aadhaar_generated * np.random.uniform(0.01, 0.15))
-        rejected_requests = int(update_requests * np.random.uniform(0.01, 0.30))
-        correction_ratio = rejected_requests / update_requests if update_requests > 0 else 0
-        avg_processing_time = np.random.uniform(3, 45) # days
-        
-        # Anomaly / Fraud indicators
-        # Spikes in specific update types
-        mobile_updates = int(update_requests * np.random.uniform(0.3, 0.7))
-        address_updates = int(update_requests * np.random.uniform(0.1, 0.4))
-        dob_updates = int(update_requests * np.random.uniform(0.05, 0.2))
-        biometric_updates = update_requests - mobile_updates - address_updates - dob_updates
-        if biometric_updates < 0: biometric_updates = 0
-        
-        # Temporal Drift Simulation
-        # Simulate staleness drift (change over last month)
-        staleness_drift = np.random.normal(0, 10) # positive means getting staler
-        if random.random() < 0.1:
-            staleness_drift += 50 # Sudden increase in staleness
-            
-        # Update type entropy input (simplified representation)
-        # We will compute actual entropy in pipeline, but here we simulate the raw counts
-        
-        data.append({
-            "region_id": region_id,
-            "state": state,
-            "district": district,
-            "sub_district": sub_district,
-            "population": population,
-            "aadhaar_generated": aadhaar_generated,
-            "avg_staleness_days": avg_staleness,
-            "update_requests_total": update_requests,
-            "rejected_requests": rejected_requests,
-            "avg_processing_time_days": avg_processing_time,
-            "mobile_updates": mobile_updates,
-            "address_updates": address_updates,
-            "dob_updates": dob_updates,
-            "biometric_updates": biometric_updates,
-            "staleness_drift": staleness_drift,
-            "operator_count": random.randint(1, 20),
-            "complaints_lodged": int(update_requests * np.random.uniform(0.0, 0.05))
-        })
-        
-    df = pd.DataFrame(data)
-    
+OUTPUT_PATH = "data/inputs/aadhaar_mock_data.parquet"
+DEFAULT_SEED = 42
+# Rows generated per block; each block is one task and one parquet row group.
+DEFAULT_BLOCK_SIZE = 1_000_000
+
+STATES = ["Maharashtra", "Uttar Pradesh", "Karnataka", "Tamil Nadu", "Bihar", "West Bengal", "Rajasthan"]
+
+REAL_DISTRICTS = {
+    "Maharashtra": ["Mumbai", "Pune", "Nagpur", "Thane", "Nashik", "Aurangabad", "Solapur"],
+    "Uttar Pradesh": ["Lucknow", "Kanpur", "Varanasi", "Agra", "Meerut", "Ghaziabad", "Noida"],
+    "Karnataka": ["Bengaluru", "Mysuru", "Hubballi", "Mangaluru", "Belagavi", "Kalaburagi"],
+    "Tamil Nadu": ["Chennai", "Coimbatore", "Madurai", "Tiruchirappalli", "Salem", "Tirunelveli"],
+    "Bihar": ["Patna", "Gaya", "Bhagalpur", "Muzaffarpur", "Purnia", "Darbhanga"],
+    "West Bengal": ["Kolkata", "Howrah", "Durgapur", "Asansol", "Siliguri", "Bardhaman"],
+    "Rajasthan": ["Jaipur", "Jodhpur", "Kota", "Bikaner", "Ajmer", "Udaipur"]
+}
+
+# Padded (state x district) lookup table so districts can be drawn per row without a loop
+_DISTRICT_COUNTS = np.array([len(REAL_DISTRICTS[s]) for s in STATES])
+_DISTRICT_TABLE = np.array(
+    [REAL_DISTRICTS[s] + [""] * (_DISTRICT_COUNTS.max() - len(REAL_DISTRICTS[s])) for s in STATES],
+    dtype=object,
+)
+
+
+def _generate_block(start, n_rows, seed_seq):
+    """Generates regions [start, start + n_rows) with one RNG stream, every column drawn at once."""
+    rng = np.random.default_rng(seed_seq)
+
+    state_idx = rng.integers(0, len(STATES), n_rows)
+    district_idx = (rng.random(n_rows) * _DISTRICT_COUNTS[state_idx]).astype(np.int64)
+    region_ids = np.char.add("R", np.char.zfill(np.arange(start, start + n_rows).astype(str), 5))
+    sub_districts = np.char.add("Taluk_", rng.integers(1, 101, n_rows).astype(str))
+
+    # Base demographics
+    population = np.maximum(rng.lognormal(10, 1, n_rows).astype(np.int64), 1000)
+    aadhaar_generated = (population * rng.uniform(0.7, 0.99, n_rows)).astype(np.int64)
+
+    # Staleness (days since last update for average record)
+    # Bimodal distribution: some regions very stale
+    avg_staleness = np.where(
+        rng.random(n_rows) < 0.2,
+        rng.uniform(800, 1500, n_rows),  # High staleness
+        rng.uniform(100, 600, n_rows),  # Normal staleness
+    )
+
+    # Service Quality Metrics
+    update_requests = (aadhaar_generated * rng.uniform(0.01, 0.15, n_rows)).astype(np.int64)
+    rejected_requests = (update_requests * rng.uniform(0.01, 0.30, n_rows)).astype(np.int64)
+    avg_processing_time = rng.uniform(3, 45, n_rows)  # days
+
+    # Anomaly / Fraud indicators
+    # Spikes in specific update types
+    mobile_updates = (update_requests * rng.uniform(0.3, 0.7, n_rows)).astype(np.int64)
+    address_updates = (update_requests * rng.uniform(0.1, 0.4, n_rows)).astype(np.int64)
+    dob_updates = (update_requests * rng.uniform(0.05, 0.2, n_rows)).astype(np.int64)
+    biometric_updates = np.maximum(update_requests - mobile_updates - address_updates - dob_updates, 0)
+
+    # Temporal Drift Simulation
+    # Simulate staleness drift (change over last month); positive means getting staler
+    staleness_drift = rng.normal(0, 10, n_rows) + np.where(rng.random(n_rows) < 0.1, 50.0, 0.0)
+
+    df = pd.DataFrame({
+        "region_id": region_ids.astype(object),
+        "state": np.asarray(STATES, dtype=object)[state_idx],
+        "district": _DISTRICT_TABLE[state_idx, district_idx],
+        "sub_district": sub_districts.astype(object),
+        "population": population,
+        "aadhaar_generated": aadhaar_generated,
+        "avg_staleness_days": avg_staleness,
+        "update_requests_total": update_requests,
+        "rejected_requests": rejected_requests,
+        "avg_processing_time_days": avg_processing_time,
+        "mobile_updates": mobile_updates,
+        "address_updates": address_updates,
+        "dob_updates": dob_updates,
+        "biometric_updates": biometric_updates,
+        "staleness_drift": staleness_drift,
+        "operator_count": rng.integers(1, 21, n_rows),
+        "complaints_lodged": (update_requests * rng.uniform(0.0, 0.05, n_rows)).astype(np.int64),
+    })
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def _empty_table():
+    """Zero rows with the generated schema (a one-row block sliced away)."""
+    return _generate_block(0, 1, np.random.SeedSequence(DEFAULT_SEED)).slice(0, 0)
+
+
+def _iter_blocks(n_regions, seed, block_size, workers):
+    """Yields the dataset as pyarrow Tables, one per block, in region order.
+
+    Block i always uses child stream i of SeedSequence(seed), so the output only
+    depends on (seed, block_size), not on how many processes produced it.
+    """
+    starts = list(range(0, n_regions, block_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    tasks = [(start, min(block_size, n_regions - start), s) for start, s in zip(starts, seeds)]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers <= 1:
+        for task in tasks:
+            yield _generate_block(*task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Keep at most 2 blocks per worker in flight so finished blocks
+        # can't pile up in memory faster than they are written.
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_generate_block, *task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_to_parquet(n_regions, output_path=OUTPUT_PATH, seed=DEFAULT_SEED,
+                        block_size=DEFAULT_BLOCK_SIZE, workers=None):
+    """Writes n_regions synthetic regions to parquet incrementally, one row group per block.
+
+    Memory stays around (2 x workers) blocks regardless of n_regions.
+    """
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    writer = None
+    try:
+        for table in _iter_blocks(n_regions, seed, block_size, workers):
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+        if writer is None:  # n_regions == 0: an empty file with the usual schema
+            writer = pq.ParquetWriter(tmp_path, _empty_table().schema)
+        writer.close()
+        writer = None
+        os.replace(tmp_path, output_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):  # failed part-way: don't leave the partial file behind
+            os.remove(tmp_path)
+    print(f"Generated synthetic data with {n_regions} regions at {output_path}")
+    return n_regions
+
+
+def generate_aadhaar_data(n_regions=1000, seed=DEFAULT_SEED, block_size=DEFAULT_BLOCK_SIZE,
+                          workers=None, output_path=OUTPUT_PATH):
+    """In-memory variant: generates, writes to output_path and returns the DataFrame."""
+    tables = list(_iter_blocks(n_regions, seed, block_size, workers)) or [_empty_table()]
+    df = pa.concat_tables(tables).to_pandas()
+
     # Create outputs directory
-    os.makedirs("data/inputs", exist_ok=True)
-    output_path = "data/inputs/aadhaar_mock_data.parquet"
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df.to_parquet(output_path, index=False)
     print(f"Generated synthetic data with {n_regions} regions at {output_path}")
     return df
 
+
 if __name__ == "__main__":
-    generate_aadhaar_data(N_REGIONS)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic Aadhaar region data.")
+    parser.add_argument("--n-regions", type=int, default=N_REGIONS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE,
+                        help="Rows per block / parquet row group")
+    parser.add_argument("--workers", type=int, default=None, help="Processes to use (default: all cores)")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    args = parser.parse_args()
+
+    generate_to_parquet(args.n_regions, args.output, seed=args.seed,
+                        block_size=args.block_size, workers=args.workers)
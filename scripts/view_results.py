@@ -1,8 +1,13 @@
 import pandas as pd
 import os
+import sys
+
+# Make the project root importable when run as `python scripts/view_results.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.snapshots import live_path
 
 def inspect_data():
-    path = "data/outputs/anomaly_data.parquet"
+    path = live_path("anomaly_data.parquet")
     if not os.path.exists(path):
         print(f"File not found: {path} - Please run the pipeline first.")
         return
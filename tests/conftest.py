@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Run from anywhere: modules/ and backend/ import as packages from the project root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # config/settings.yaml is read relative to the working directory
@@ -0,0 +1,35 @@
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from backend.cursors import decode_cursor, encode_cursor
+
+FILTERS = {"state": "Bihar", "min_risk": 20.0, "is_anomaly": None}
+
+
+def _forged(filters):
+    payload = {"v": [1, 2], "o": "risk_desc", "f": filters, "k": [55.0, "R0001"]}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_round_trips_a_cursor():
+    cursor = encode_cursor((1, 2), "risk_desc", FILTERS, (55.0, "R0001"))
+    assert decode_cursor(cursor) == ((1, 2), "risk_desc", FILTERS, (55.0, "R0001"))
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"state": "Bihar", "min_risk": 20.0},
+    dict(FILTERS, anomalies_only=True),
+    dict(FILTERS, min_risk="high"),
+    dict(FILTERS, min_risk=True),
+    dict(FILTERS, min_risk=None),
+    dict(FILTERS, is_anomaly="yes"),
+    dict(FILTERS, state=7),
+])
+def test_rejects_forged_filters_with_a_400(filters):
+    with pytest.raises(HTTPException) as raised:
+        decode_cursor(_forged(filters))
+    assert raised.value.status_code == 400
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from modules.history import HistoryStore, append_history, compact_history
+
+
+def _runs_frame(n_regions=20):
+    return pd.DataFrame({
+        "region_id": [f"R{i:03d}" for i in range(n_regions)],
+        "inclusion_score": 50.0,
+        "risk_score": 10.0,
+        "anomaly_score": 0.0,
+        "is_anomaly": False,
+        "anomaly_reason": "Normal",
+    })
+
+
+def test_compacts_a_month_with_more_runs_than_an_int8_dictionary_holds(tmp_path):
+    df = _runs_frame()
+    start = datetime(2026, 9, 1, tzinfo=timezone.utc)
+    run_ids = [f"run{i:03d}" for i in range(200)]
+    for i, run_id in enumerate(run_ids):
+        append_history(df, run_id, start + timedelta(hours=3 * i), path=str(tmp_path))
+
+    compact_history(str(tmp_path), before=datetime(2026, 11, 1).date())
+
+    assert not any(p.name.startswith("run_date=") for p in tmp_path.iterdir())
+    history = HistoryStore(str(tmp_path)).region("R007")
+    assert history["run_id"].astype(str).tolist() == run_ids
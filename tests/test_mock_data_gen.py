@@ -0,0 +1,26 @@
+import pyarrow.parquet as pq
+import pytest
+
+from scripts import mock_data_gen
+from scripts.mock_data_gen import generate_aadhaar_data, generate_to_parquet
+
+
+def test_zero_regions_writes_an_empty_file_with_the_schema(tmp_path):
+    empty, full = str(tmp_path / "empty.parquet"), str(tmp_path / "full.parquet")
+    generate_to_parquet(0, empty, workers=1)
+    generate_to_parquet(10, full, workers=1)
+
+    assert pq.read_metadata(empty).num_rows == 0
+    assert pq.read_schema(empty).equals(pq.read_schema(full))
+    assert generate_aadhaar_data(0, workers=1, output_path=str(tmp_path / "df.parquet")).empty
+
+
+def test_failed_write_leaves_no_tmp_file(tmp_path, monkeypatch):
+    def broken_blocks(*args):
+        yield mock_data_gen._empty_table()
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(mock_data_gen, "_iter_blocks", broken_blocks)
+    with pytest.raises(RuntimeError):
+        generate_to_parquet(10, str(tmp_path / "out.parquet"), workers=1)
+    assert list(tmp_path.iterdir()) == []
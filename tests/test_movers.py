@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from modules.movers import _sorted_merge, build_movers
+
+
+def test_matches_each_current_region_to_its_previous_row():
+    matched = _sorted_merge(pd.Series(["R3", "R1", "R9"]), pd.Series(["R1", "R2", "R3"]))
+    assert matched.tolist() == [2, 0, -1]
+
+
+@pytest.mark.parametrize("current, previous", [
+    (["R1", "R2", "R1"], ["R1", "R2"]),
+    (["R1", "R2"], ["R2", "R2", "R1"]),
+    (["R1", "R1"], []),
+])
+def test_rejects_repeated_region_ids(current, previous):
+    with pytest.raises(ValueError, match="repeated"):
+        _sorted_merge(pd.Series(current, dtype=object), pd.Series(previous, dtype=object))
+
+
+def test_build_movers_rejects_a_previous_run_with_repeated_regions():
+    current = pd.DataFrame({"region_id": ["R1", "R2"], "state": ["Goa", "Goa"], "district": ["D", "D"],
+                            "risk_score": [1.0, 2.0], "inclusion_score": 1.0, "staleness_drift": 0.0})
+    previous = pd.concat([current, current.iloc[:1]])
+    with pytest.raises(ValueError):
+        build_movers(current, previous)
+    assert build_movers(current, current)["compared_regions"] == 2
@@ -0,0 +1,28 @@
+import pyarrow.parquet as pq
+
+from modules.orchestrator import PipelineOrchestrator
+
+
+def test_generated_input_is_written_to_input_path(tmp_path):
+    input_path = str(tmp_path / "inputs" / "regions.parquet")
+    orchestrator = PipelineOrchestrator(input_path=input_path, output_dir=str(tmp_path / "outputs"),
+                                        model_dir=str(tmp_path / "models"))
+
+    result = orchestrator.run(generate=True, n_regions=300)
+
+    assert result["rows"] == 300
+    assert pq.read_metadata(input_path).num_rows == 300
+
+
+def test_streaming_run_matches_the_in_memory_run(tmp_path):
+    input_path = str(tmp_path / "inputs" / "regions.parquet")
+    results = {}
+    for stream in (False, True):
+        orchestrator = PipelineOrchestrator(input_path=input_path, output_dir=str(tmp_path / f"outputs-{stream}"),
+                                            model_dir=str(tmp_path / f"models-{stream}"), stream=stream)
+        results[stream] = orchestrator.run(generate=not stream, n_regions=300)
+        results[stream]["df"] = orchestrator.df.sort_values("region_id", ignore_index=True)
+
+    assert "process_streaming" in results[True]["timings"]
+    assert results[True]["rows"] == results[False]["rows"] == 300
+    assert results[True]["df"]["risk_score"].tolist() == results[False]["df"]["risk_score"].tolist()
@@ -0,0 +1,21 @@
+import numpy as np
+
+from modules.quantile_sketch import KLLSketch
+
+
+def test_odd_compaction_leaves_either_end_behind():
+    left_behind = set()
+    for seed in range(32):
+        sketch = KLLSketch(k=4, seed=seed).update(np.arange(5.0))
+        assert sum(len(items) * 2 ** h for h, items in enumerate(sketch.levels)) == 5
+        left_behind.update(sketch.levels[0].tolist())
+    assert left_behind == {0.0, 4.0}
+
+
+def test_quantiles_stay_within_the_rank_error():
+    values = np.random.default_rng(0).permutation(100_000).astype(np.float64)
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(values, 1_000):
+        sketch.update(chunk)
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        assert abs(sketch.quantile(q) / len(values) - q) <= sketch.rank_error
@@ -0,0 +1,19 @@
+import pandas as pd
+
+from modules.rollup import build_rollup, node_key
+
+
+def test_a_separator_inside_a_name_does_not_collide_with_a_deeper_key():
+    assert node_key("A/B") != node_key("A", "B")
+    assert node_key("A%2FB") != node_key("A/B")
+
+    df = pd.DataFrame({
+        "state": ["A/B", "A"], "district": ["C", "B"], "sub_district": ["S1", "S2"],
+        "population": [100, 200], "aadhaar_generated": [90, 180], "rejected_requests": [1, 2],
+        "inclusion_score": [50.0, 60.0], "risk_score": [10.0, 20.0], "is_anomaly": [False, True],
+    })
+    rollup = build_rollup(df)
+
+    assert rollup["nodes"][node_key("A/B")]["regions"] == 1
+    assert rollup["nodes"][node_key("A", "B")]["level"] == "district"
+    assert rollup["children"]["district"][node_key("A/B")] == [node_key("A/B", "C")]
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from modules.anomaly_detector import AnomalyDetector
+from modules.schema import ANOMALY_COLUMNS, compact_dtypes, map_columns, read_columns
+from modules.storage import dataset_version
+
+
+def _anomaly_frame(n_regions=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({column: rng.random(n_regions) for column in ANOMALY_COLUMNS})
+    df["region_id"] = [f"R{i:04d}" for i in rng.permutation(n_regions)]
+    # Names whose quoted partition directories sort differently from the names themselves
+    states = np.array(["Tamil Nadu", "Tamil-Nadu", "Bihar", "Uttar Pradesh", None], dtype=object)
+    df["state"] = pd.Categorical(states[rng.integers(0, len(states), n_regions)])
+    df["district"] = pd.Categorical([f"D{i % 7}" for i in range(n_regions)])
+    df["sub_district"] = pd.Categorical([f"S{i % 11}" for i in range(n_regions)])
+    df["risk_score"] = rng.integers(0, 20, n_regions).astype(np.float64)  # ties, broken by region_id
+    for column in ("is_anomaly_if", "is_anomaly_rule_bot", "is_anomaly"):
+        df[column] = df[column] > 0.5
+    df["anomaly_reason"] = pd.Categorical(np.where(df["is_anomaly"], "Bot", "Normal"))
+    return compact_dtypes(df)  # as loaded by the pipeline
+
+
+def test_arrow_copy_matches_the_parquet_dataset_row_for_row(tmp_path):
+    detector = AnomalyDetector.__new__(AnomalyDetector)
+    detector.df = _anomaly_frame()
+    data_path, arrow_path = str(tmp_path / "anomaly_data.parquet"), str(tmp_path / "anomaly_data.arrow")
+
+    detector.save_anomalies(data_path, arrow_path=arrow_path)
+
+    from_parquet = read_columns(data_path, ANOMALY_COLUMNS)
+    from_arrow, version = map_columns(arrow_path, ANOMALY_COLUMNS)
+    assert version == dataset_version(data_path)
+    assert from_arrow["region_id"].tolist() == from_parquet["region_id"].tolist()
+    for column in ANOMALY_COLUMNS:
+        assert from_arrow[column].astype(object).tolist() == from_parquet[column].astype(object).tolist(), column
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+
+from modules.storage import write_dataset
+from modules.telemetry import REGISTRY, record_bytes
+
+
+def _bytes_read(stage):
+    return REGISTRY._counters.get(("airr_bytes_read_total", (("stage", stage),)), 0)
+
+
+def test_projected_reads_count_only_the_selected_columns(tmp_path):
+    n = 10_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "region_id": [f"R{i:05d}" for i in range(n)],
+        "state": pd.Categorical(np.where(np.arange(n) % 2, "Bihar", "Goa")),
+        "risk_score": rng.random(n),
+        "padding": [bytes(row).hex() for row in rng.integers(0, 256, (n, 32), dtype=np.uint8)],
+    })
+    path = str(tmp_path / "data.parquet")
+    write_dataset(df, path)
+
+    record_bytes("read", path, "test_projected", columns=["risk_score"])
+    record_bytes("read", path, "test_whole")
+
+    assert 0 < _bytes_read("test_projected") < _bytes_read("test_whole") / 4